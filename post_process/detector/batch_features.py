@@ -0,0 +1,347 @@
+from utils import *
+from data_loader import *
+import numpy as np
+
+# Batch version of extract_window + extract_feature (data_processing.py).
+# Instead of slicing every 5 s window and looping over its samples, each
+# series is scanned once: window bounds come from one binary_search_all per
+# series, and the feature rules are answered with prefix counts/sums and range min/max.
+# The returned matrix row i is identical to
+#   extract_feature(extract_window(data_dict, start_times[i], end_times[i]))
+
+# sums of integer-valued data are exact in float64 below this magnitude,
+# so prefix sums give the same result as summing the window directly
+EXACT_SUM_LIMIT = 2 ** 53
+# windows evaluated together; bounds the temporaries to one stretch of
+# the trace so (memory-mapped) day-long series never sit in memory at once
+CHUNK_WINDOWS = 2048
+# thresholds of extract_feature; a sweep evaluates other values against the
+# same window statistics
+THRESHOLDS = {"fps_low": 25,         # 0-3: min framerate below ...
+              "fps_high": 27,        # ... and max framerate above
+              "delay": 0.08,         # 18-19: max packet delay (s)
+              "tbs_ratio": 0.8,      # 21-22: min/max allocated TBS
+              "ct_thres": 0.2,       # 25-26: PRB share of other UEs
+              "channel_thres": 10,   # 27-28: low median MCS
+              "harq_count": 20}      # 30-31: HARQ retransmissions per window
+
+def window_bounds(data, start_times, end_times):
+  # sample offsets of get_window for every window; an end before its
+  # start is an empty slice there
+  starts = binary_search_all(data[0, :], start_times)
+  ends = binary_search_all(data[0, :], end_times)
+  return starts, np.maximum(ends, starts)
+
+def prefix_count(mask):
+  # prefix[i] = number of True entries in mask[:i]
+  prefix = np.zeros(mask.shape[0] + 1, dtype=np.int64)
+  np.cumsum(mask, out=prefix[1:])
+  return prefix
+
+def take_range(prefix, starts, ends):
+  return prefix[ends] - prefix[starts]
+
+def range_count(mask, starts, ends):
+  # number of True entries in mask[start:end] for every window
+  return take_range(prefix_count(mask), starts, ends)
+
+def range_reduce(values, starts, ends, ufunc, empty):
+  # ufunc.reduce(values[start:end]) for every window, `empty` for empty ones.
+  # Sparse-table lookup that only keeps one level in memory at a time.
+  lengths = ends - starts
+  out = np.full(starts.shape, empty, dtype=float)
+  nonempty = lengths > 0
+  if (not np.any(nonempty)):
+    return out
+  level_of = np.zeros(starts.shape, dtype=np.int64)
+  level_of[nonempty] = np.frexp(lengths[nonempty])[1] - 1
+  max_level = np.max(level_of[nonempty])
+
+  level = values
+  width = 1
+  for k in range(max_level + 1):
+    if (k > 0):
+      level = ufunc(level[:-width], level[width:])
+      width *= 2
+    sel = nonempty & (level_of == k)
+    out[sel] = ufunc(level[starts[sel]], level[ends[sel] - width])
+  return out
+
+def is_exact_sum(values):
+  # can prefix sums reproduce a direct sum of any window bit for bit?
+  if (values.dtype.kind in 'biu'):
+    return True
+  with np.errstate(invalid='ignore', over='ignore'):
+    return bool(np.all(np.isfinite(values)) and np.all(values == np.rint(values))
+                and np.sum(np.abs(values)) < EXACT_SUM_LIMIT)
+
+def range_sum(values, starts, ends, reduce):
+  # reduce(values[start:end]) for a summing reduce, through prefix sums
+  # when exact and window by window otherwise
+  if (is_exact_sum(values)):
+    prefix = np.zeros(values.shape[0] + 1, dtype=np.int64 if values.dtype.kind in 'biu' else float)
+    np.cumsum(values, out=prefix[1:])
+    return take_range(prefix, starts, ends)
+  return np.array([reduce(values[s:e]) for (s, e) in zip(starts, ends)], dtype=float)
+
+def paired_sum(a, a_bounds, b, b_bounds, op, reduce):
+  # reduce(op(a[sa:ea], b[sb:eb])) for every window with numpy broadcasting:
+  # equal lengths pair up elementwise and a length-1 side is broadcast.
+  # Also returns which windows broadcast at all (the rest raise ValueError).
+  (sa, ea) = a_bounds
+  (sb, eb) = b_bounds
+  la = ea - sa
+  lb = eb - sb
+  out = np.zeros(sa.shape, dtype=float)
+  ok = (la == lb) | (la == 1) | (lb == 1)
+
+  # equal lengths: one aligned pass per offset between the two series
+  aligned = (la == lb) & (la > 0)
+  delta = sa - sb
+  for d in np.unique(delta[aligned]):
+    sel = aligned & (delta == d)
+    k_lo = max(0, -d)
+    k_hi = min(b.shape[0], a.shape[0] - d)
+    paired = op(a[k_lo+d:k_hi+d], b[k_lo:k_hi])
+    out[sel] = range_sum(paired, sb[sel] - k_lo, eb[sel] - k_lo, reduce)
+
+  # broadcast against a single sample: rare, done window by window
+  for i in np.nonzero(ok & (la != lb))[0]:
+    out[i] = reduce(op(a[sa[i]:ea[i]], b[sb[i]:eb[i]]))
+  return out, ok
+
+def block_rise(values, starts, ends):
+  # rule of features 16-19: average the window in blocks of 10 samples
+  # (the last block slot left at 0) and look for any increase
+  n_blocks = (ends - starts) // 10
+  rise = np.zeros(starts.shape, dtype=bool)
+  for phase in range(10):
+    sel = (starts % 10 == phase) & (n_blocks >= 2)
+    if (not np.any(sel)):
+      continue
+    count = (values.shape[0] - phase) // 10
+    means = values[phase:phase + 10*count].reshape(count, 10).mean(axis=1)
+    first = (starts[sel] - phase) // 10
+    last = first + n_blocks[sel] - 2
+    rising = take_range(prefix_count(means[1:] > means[:-1]), first, last)
+    rise[sel] = (rising > 0) | (means[last] < 0)
+  return rise
+
+def first_drop(values, starts, ends):
+  # any negative step between consecutive samples of the window
+  drops = prefix_count((values[1:] - values[:-1]) < 0)
+  last = max(values.shape[0] - 1, 0)
+  return take_range(drops, np.minimum(starts, last),
+                    np.minimum(np.maximum(ends - 1, starts), last)) > 0
+
+def check_broadcast(ok, a_key, b_key):
+  if (not np.all(ok)):
+    raise ValueError('windows of {} and {} cannot be broadcast together'.format(a_key, b_key))
+
+def window_index_of(data_dict, start_times, end_times):
+  window_index = np.zeros([start_times.shape[0], len(keys), 2], dtype=np.int64)
+  for (j, key) in enumerate(keys):
+    (window_index[:, j, 0], window_index[:, j, 1]) = \
+      window_bounds(data_dict[key], start_times, end_times)
+  return window_index
+
+def extract_all_stats(data_dict, start_times, end_times, window_index=None,
+                      chunk_windows=CHUNK_WINDOWS, channel_thresholds=[THRESHOLDS["channel_thres"]]):
+  # window_stats of every window, evaluated chunk by chunk.
+  # window_index: optional table from build_window_index for these windows
+  if (window_index is None):
+    window_index = window_index_of(data_dict, start_times, end_times)
+  chunks = []
+  for first in range(0, start_times.shape[0], chunk_windows):
+    rows = window_index[first:first + chunk_windows]
+    # only the stretch of each series these windows cover
+    lo = np.min(rows[:, :, 0], axis=0)
+    hi = np.max(rows[:, :, 1], axis=0)
+    chunk_dict = {}
+    for (j, key) in enumerate(keys):
+      chunk_dict[key] = data_dict[key][:, lo[j]:hi[j]]
+    chunks.append(window_stats(chunk_dict, rows - lo[np.newaxis, :, np.newaxis],
+                               channel_thresholds))
+  if (len(chunks) == 0):
+    chunks.append(window_stats({key: data_dict[key][:, :0] for key in keys},
+                               window_index, channel_thresholds))
+  return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+def extract_all_features(data_dict, start_times, end_times, max_prb=0, window_index=None,
+                         chunk_windows=CHUNK_WINDOWS, thresholds=THRESHOLDS):
+  stats = extract_all_stats(data_dict, start_times, end_times, window_index, chunk_windows,
+                            [thresholds["channel_thres"]])
+  return stats_to_features(stats, thresholds, max_prb)
+
+def stats_to_features(stats, thresholds=THRESHOLDS, max_prb=0):
+  # apply the thresholds of extract_feature to the output of window_stats
+  feature = np.copy(stats["feature"])
+  with np.errstate(divide='ignore', invalid='ignore'):
+    ## 0-3. fps drop
+    for i in range(4):
+      feature[:, i] = (stats[("min_framerate", i)] < thresholds["fps_low"]) & \
+        (stats[("max_framerate", i)] > thresholds["fps_high"])
+    ## 18-19. delay increase
+    for i in [18, 19]:
+      feature[:, i] = stats[("delay_rise", i)] & (stats[("max_delay", i)] > thresholds["delay"])
+    ## 21-22. TBS drop (empty window counts as a drop)
+    for i in [21, 22]:
+      feature[:, i] = stats[("tbs_empty", i)] | \
+        (stats[("min_tbs", i)] / stats[("max_tbs", i)] < thresholds["tbs_ratio"])
+    ## 25-26. cross traffic
+    for i in [25, 26]:
+      feature[:, i] = (stats[("prb_peak", i)] > 0.8*max_prb) & \
+        (stats[("prb_share", i)] > thresholds["ct_thres"])
+    ## 27-28. bad channel
+    for (i, direction) in [(27, 'ul'), (28, 'dl')]:
+      low_mcs = stats[("low_mcs", i, thresholds["channel_thres"])] > 10
+      if (np.any(low_mcs & stats[("mcs_90_empty", i)])):
+        raise ValueError('zero-size window of time_{}_90mcs'.format(direction))
+      feature[:, i] = low_mcs & stats[("mcs_90_low", i)]
+    ## 30-31. HARQ retransmissions
+    for i in [30, 31]:
+      feature[:, i] = stats[("harq", i)] > thresholds["harq_count"]
+  return feature
+
+def window_stats(data_dict, window_index, channel_thresholds=[THRESHOLDS["channel_thres"]]):
+  # Everything extract_feature measures in a window, offsets relative to
+  # data_dict: "feature" holds the rules without a tunable threshold, the
+  # other entries are the statistics stats_to_features compares against
+  # THRESHOLDS. One array per entry, one element per window.
+  num_windows = window_index.shape[0]
+  feature = np.zeros([num_windows, 36])
+  stats = {"feature": feature}
+  bounds = {}
+  values = {}
+  def series(key):
+    if key not in bounds:
+      j = keys.index(key)
+      bounds[key] = (window_index[:, j, 0], window_index[:, j, 1])
+      values[key] = np.asarray(data_dict[key][1, :])
+    return values[key], bounds[key]
+  def length(key):
+    (starts, ends) = series(key)[1]
+    return ends - starts
+
+  with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+    ''' Consequences: '''
+    ## 0-3. does inbound/outbound fps drop? min/max framerate
+    for (i, key) in [(0, 'time_dl_in_framerate'), (1, 'time_ul_in_framerate'),
+                     (2, 'time_ul_out_framerate'), (3, 'time_dl_out_framerate')]:
+      (v, (starts, ends)) = series(key)
+      stats[("max_framerate", i)] = range_reduce(v, starts, ends, np.maximum, -np.inf)
+      stats[("min_framerate", i)] = range_reduce(v, starts, ends, np.minimum, np.inf)
+
+    ## 4-5. bool: does outbound resolution drop?
+    for (i, key) in [(4, 'time_ul_out_res'), (5, 'time_dl_out_res')]:
+      (v, (starts, ends)) = series(key)
+      feature[:, i] = first_drop(v, starts, ends)
+
+    ''' Intermediate States for GCC/WebRTC: '''
+    ## 6-7. bool: does jitter buffer drain?
+    feature[:, 6] = length('time_dl_jb_delay_per_frame') > 1
+    feature[:, 7] = length('time_ul_jb_delay_per_frame') > 1
+
+    ## 8-9, 12-13. bool: does target bit rate / pushback rate drop?
+    for (i, key) in [(8, 'time_ul_loss_based_rate'), (9, 'time_dl_loss_based_rate'),
+                     (12, 'time_ul_pushback'), (13, 'time_dl_pushback')]:
+      (v, (starts, ends)) = series(key)
+      feature[:, i] = first_drop(v, starts, ends)
+
+    ## 10-11. bool: does gcc detect overuse?
+    for (i, key) in [(10, 'time_ul_overuse'), (11, 'time_dl_overuse')]:
+      (v, (starts, ends)) = series(key)
+      feature[:, i] = range_count(v > 0, starts, ends) > 0
+
+    ## 14-15. bool: is the congestion window full?
+    for (i, direction) in [(14, 'ul'), (15, 'dl')]:
+      (outstanding, outstanding_bounds) = series('time_{}_gcc_outstanding_bytes'.format(direction))
+      (window_bytes, window_bounds_) = series('time_{}_gcc_window_bytes'.format(direction))
+      (full, ok) = paired_sum(outstanding, outstanding_bounds, window_bytes, window_bounds_,
+                              lambda x, y: x / y >= 1, np.sum)
+      feature[:, i] = ok & (full > 0)
+
+    ## 16-17. bool: do outstanding bytes increase?
+    for (i, key) in [(16, 'time_ul_gcc_outstanding_bytes'), (17, 'time_dl_gcc_outstanding_bytes')]:
+      (v, (starts, ends)) = series(key)
+      feature[:, i] = block_rise(v, starts, ends)
+
+    ''' Center: '''
+    ## 18-19. does delay increase? block rise and max delay
+    for (i, key) in [(18, 'time_dl_pkt_delay_ue'), (19, 'time_ul_pkt_delay_ue')]:
+      (v, (starts, ends)) = series(key)
+      stats[("max_delay", i)] = range_reduce(v, starts, ends, np.maximum, -np.inf)
+      stats[("delay_rise", i)] = block_rise(v, starts, ends)
+
+    ''' 5G States: '''
+    ## 20: bool: does UL/DL rnti change?
+    (v, (starts, ends)) = series('time_ul_rnti')
+    nonempty = ends > starts
+    is_nan = np.isnan(v)
+    nonzero = (v != 0) & ~is_nan
+    lowest = range_reduce(np.where(nonzero, v, np.inf), starts, ends, np.minimum, np.inf)
+    highest = range_reduce(np.where(nonzero, v, -np.inf), starts, ends, np.maximum, -np.inf)
+    rnti_0 = np.zeros(num_windows)
+    rnti_0[nonempty] = v[starts[nonempty]]
+    feature[:, 20] = nonempty & ((range_count(is_nan, starts, ends) > 0) |
+      ((range_count(nonzero, starts, ends) > 0) & ((lowest != highest) | (lowest != rnti_0))))
+
+    ## 21-22. does allocated TBS drop? min/max TBS
+    for (i, key) in [(21, 'time_ul_tbs'), (22, 'time_dl_tbs')]:
+      (v, (starts, ends)) = series(key)
+      stats[("max_tbs", i)] = range_reduce(v, starts, ends, np.maximum, -np.inf)
+      stats[("min_tbs", i)] = range_reduce(v, starts, ends, np.minimum, np.inf)
+      stats[("tbs_empty", i)] = ends == starts
+
+    ## 23-24. bool: does app bitrate > PHY rate?
+    for (i, direction) in [(23, 'ul'), (24, 'dl')]:
+      pkt_key = 'time_{}_pkt'.format(direction)
+      tbs_key = 'time_{}_tbs'.format(direction)
+      (pkt, pkt_bounds) = series(pkt_key)
+      (tbs, tbs_bounds) = series(tbs_key)
+      (over, ok) = paired_sum(pkt, pkt_bounds, tbs, tbs_bounds, lambda x, y: x - y > 0, np.sum)
+      check_broadcast(ok, pkt_key, tbs_key)
+      feature[:, i] = over > 0.1 * length(pkt_key)
+
+    ## 25-26. is there cross traffic from other UEs? PRB peak and share
+    append_zero_sum = lambda w: np.sum(np.append(w, [0]))
+    for (i, direction) in [(25, 'dl'), (26, 'ul')]:
+      (interest, (si, ei)) = series('time_{}_prb_interest'.format(direction))
+      (others, (so, eo)) = series('time_{}_prb_others'.format(direction))
+      stats[("prb_peak", i)] = np.maximum(range_reduce(interest, si, ei, np.maximum, -np.inf), 0) + \
+        np.maximum(range_reduce(others, so, eo, np.maximum, -np.inf), 0)
+      sum_interest = range_sum(interest, si, ei, append_zero_sum)
+      sum_others = range_sum(others, so, eo, append_zero_sum)
+      stats[("prb_share", i)] = sum_others / (sum_interest + sum_others)
+
+    ## 27-28. is the channel bad? low MCS counts per channel threshold
+    for (i, direction) in [(27, 'ul'), (28, 'dl')]:
+      (mcs_50, (s50, e50)) = series('time_{}_50mcs'.format(direction))
+      (mcs_90, (s90, e90)) = series('time_{}_90mcs'.format(direction))
+      for channel_thres in channel_thresholds:
+        stats[("low_mcs", i, channel_thres)] = range_count(mcs_50 < channel_thres, s50, e50)
+      stats[("mcs_90_empty", i)] = e90 == s90
+      stats[("mcs_90_low", i)] = range_count(mcs_90 < 20, s90, e90) == e90 - s90
+
+    ## 29. bool: is there UL scheduling delay?
+    feature[:, 29] = 1
+
+    ## 30-31. are there HARQ retransmissions? retransmission counts
+    stats[("harq", 30)] = length('time_ul_rtx')
+    stats[("harq", 31)] = length('time_dl_rtx')
+
+    ## 32-33. bool: are there RLC retransmissions?
+    feature[:, 32] = 0
+    feature[:, 33] = 0
+
+    ## 34-35. bool: is pushback rate not equal to target bit rate?
+    for (i, direction) in [(34, 'ul'), (35, 'dl')]:
+      pb_key = 'time_{}_pushback'.format(direction)
+      target_key = 'time_{}_loss_based_rate'.format(direction)
+      (pb, pb_bounds) = series(pb_key)
+      (target, target_bounds) = series(target_key)
+      (pb_target, ok) = paired_sum(pb, pb_bounds, target, target_bounds, lambda x, y: x - y, sum)
+      check_broadcast(ok, pb_key, target_key)
+      feature[:, i] = pb_target != 0
+
+  return stats
@@ -0,0 +1,214 @@
+from decision_tree import *
+from generate_chain_search import compile_chain_search
+import argparse
+import json
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# usage: python3 benchmark.py --duration 1800 --rate-scale 2
+# Times the detection pipeline stage by stage on synthetic .mat files for
+# every key in data_loader.keys, so detector changes can be compared
+# without the experiment data. Series that the feature rules pair up
+# (pkt/tbs, pushback/target rate, gcc outstanding/window bytes) share one
+# time grid, like the real exports.
+
+# samples per second of each series before --rate-scale
+default_rates = {'mcs': 10, 'pkt': 50, 'tbs': 50, 'gcc': 20, 'rate': 5, 'pushback': 5,
+                 'tx': 10, 'framerate': 1, 'res': 1, 'delay': 30, 'prb': 50, 'rnti': 10}
+
+def rate_group(key):
+  # series that must share a time grid, and the rate entry of the key
+  direction = key.split('_')[1]
+  if (key.endswith('_pkt') or key.endswith('_tbs')):
+    return direction + '_pkt', 'pkt'
+  if ('pushback' in key or 'loss_based' in key):
+    return direction + '_rate', 'rate'
+  if ('gcc_' in key):
+    return direction + '_gcc', 'gcc'
+  for name in ['mcs', 'tx', 'framerate', 'res', 'delay', 'prb', 'rnti']:
+    if name in key:
+      return direction + '_' + name, name
+  return key, None
+
+def synthetic_series(duration, rate_scale=1, seed=0):
+  rng = np.random.default_rng(seed)
+  grids = {}
+  data_dict = {}
+  for key in keys:
+    (group, name) = rate_group(key)
+    if group not in grids:
+      rate = default_rates.get(name, 10) * rate_scale
+      grids[group] = np.sort(rng.uniform(0, duration, int(duration * rate)))
+    t = grids[group]
+    n = t.shape[0]
+    if ('framerate' in key):
+      v = rng.integers(20, 32, n)
+    elif ('mcs' in key):
+      v = rng.integers(0, 28, n)
+    elif ('rnti' in key):
+      v = rng.choice([17] * 50 + [42], n)
+    elif ('delay' in key):
+      v = rng.exponential(0.04, n)
+    elif ('prb' in key):
+      v = rng.integers(0, 50, n)
+    elif ('overuse' in key):
+      v = rng.random(n) < 0.01
+    elif ('pushback' in key or 'loss_based' in key):
+      v = np.round(np.cumsum(rng.normal(0, 1, n)) * 1000 + 1e6)
+    elif ('res' in key):
+      v = rng.choice([360, 720, 720, 720], n)
+    else:
+      v = rng.integers(0, 10000, n)
+    data_dict[key] = np.vstack([t, v.astype(float)])
+  # pushback mostly follows the target rate
+  for direction in ['ul', 'dl']:
+    pushback = data_dict['time_{}_pushback'.format(direction)]
+    target = data_dict['time_{}_loss_based_rate'.format(direction)]
+    follow = rng.random(pushback.shape[1]) < 0.9
+    pushback[1, follow] = target[1, follow]
+  return data_dict
+
+def write_synthetic(datapath, duration, rate_scale=1, seed=0):
+  data_dict = synthetic_series(duration, rate_scale, seed)
+  for key in keys:
+    sio.savemat(datapath + key + '.mat', {key: data_dict[key]})
+  return sum(data_dict[key].shape[1] for key in keys)
+
+# seconds between two RSS samples while a stage runs
+RSS_POLL_S = 0.005
+
+def current_rss():
+  # resident set size in bytes, None where /proc is not available
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * resource.getpagesize()
+  except OSError:
+    return None
+
+class RssSampler:
+  # Peak RSS while one stage runs, polled from a background thread.
+  # ru_maxrss only knows the peak of the whole process so far, which hides
+  # every stage that needs less than an earlier one.
+  def __init__(self):
+    self.start = current_rss()
+    self.peak = self.start
+    self.stopped = threading.Event()
+    self.thread = threading.Thread(target=self.poll, daemon=True)
+    self.thread.start()
+
+  def sample(self):
+    rss = current_rss()
+    if (rss is not None):
+      self.peak = max(self.peak, rss)
+
+  def poll(self):
+    while (not self.stopped.wait(RSS_POLL_S)):
+      self.sample()
+
+  def stop(self):
+    self.stopped.set()
+    self.thread.join()
+    self.sample()
+
+class Stages:
+  # wall time, peak RSS during the stage (and how far it rose above the RSS
+  # the stage started with) and, with trace_memory, peak traced allocations
+  # of every stage
+  def __init__(self, trace_memory=False):
+    self.trace_memory = trace_memory
+    self.rows = []
+
+  def run(self, name, func, windows=0):
+    if (self.trace_memory):
+      tracemalloc.start()
+    rss = RssSampler()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    rss.stop()
+    row = {"stage": name, "seconds": seconds,
+           "windows/s": windows / seconds if (windows > 0 and seconds > 0) else None,
+           "peak rss MB": rss.peak / 2**20 if (rss.peak is not None) else None,
+           "rss growth MB": (rss.peak - rss.start) / 2**20 if (rss.peak is not None) else None}
+    if (self.trace_memory):
+      row["peak traced MB"] = tracemalloc.get_traced_memory()[1] / 2**20
+      tracemalloc.stop()
+    self.rows.append(row)
+    return result
+
+  def table(self):
+    return pd.DataFrame(self.rows).to_string(index=False, float_format=lambda x: '{:.3f}'.format(x),
+                                             na_rep='')
+
+def run_benchmark(datapath, trace_memory=False):
+  stages = Stages(trace_memory)
+  data_dict = stages.run("load_all_data", lambda: load_all_data(keys, datapath))
+  (start_times, end_times, window_index) = stages.run(
+    "build_window_index", lambda: build_window_index(data_dict, keys, WINDOW_LEN, STEP_LEN))
+  num_windows = start_times.shape[0]
+
+  def extract_windows():
+    return [extract_window(data_dict, start_times[i], end_times[i])
+            for i in range(num_windows)]
+  windows = stages.run("extract_window", extract_windows, num_windows)
+  features = stages.run("extract_feature",
+                        lambda: np.array([extract_feature(window) for window in windows]),
+                        num_windows)
+  del windows
+  batch = stages.run("extract_all_features", lambda: extract_all_features(
+    data_dict, start_times, end_times, window_index=window_index), num_windows)
+  if (not np.array_equal(features, batch)):
+    print("warning: batch features differ from extract_feature")
+
+  traced = stages.run("back_trace", lambda: [back_trace(feature) for feature in batch],
+                      num_windows)
+  chain_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'input_final.txt')
+  backward_trace = compile_chain_search(chain_file)
+  stages.run("backward_trace", lambda: [backward_trace(feature) for feature in batch],
+             num_windows)
+  backward_trace_vectorized = compile_chain_search(chain_file, True)
+  stages.run("backward_trace_vectorized", lambda: backward_trace_vectorized(batch), num_windows)
+
+  def write_csv():
+    results = new_results()
+    for i in range(num_windows):
+      if (len(traced[i][0]) != 0):
+        window = slice_window(data_dict, window_index[i])
+        append_event(results, start_times[i], end_times[i], window, batch[i], traced[i])
+    pd.DataFrame(results_to_columns(results)).to_csv(datapath + 'events_detection.csv', index=False)
+  stages.run("write events csv", write_csv, num_windows)
+  stages.run("run_detection", lambda: run_detection(datapath), num_windows)
+  return stages, num_windows
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--duration', type=float, default=600, help="seconds of synthetic trace")
+  parser.add_argument('--rate-scale', type=float, default=1,
+                      help="multiplies every sample rate in default_rates")
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--trace-memory', action='store_true',
+                      help="also report peak allocations per stage (slows every stage down)")
+  parser.add_argument('--keep', default=None,
+                      help="write the synthetic .mat files here and keep them")
+  parser.add_argument('--json', default=None, help="also save the results as JSON")
+  args = parser.parse_args()
+
+  datapath = args.keep if args.keep is not None else tempfile.mkdtemp(prefix='detector_bench_')
+  datapath = os.path.join(datapath, '')
+  os.makedirs(datapath, exist_ok=True)
+  try:
+    num_samples = write_synthetic(datapath, args.duration, args.rate_scale, args.seed)
+    (stages, num_windows) = run_benchmark(datapath, args.trace_memory)
+  finally:
+    if (args.keep is None):
+      shutil.rmtree(datapath)
+  print("{:.0f} s trace, {} samples, {} windows".format(args.duration, num_samples, num_windows))
+  print(stages.table())
+  if (args.json is not None):
+    with open(args.json, 'w') as f:
+      json.dump({"duration": args.duration, "rate_scale": args.rate_scale, "samples": num_samples,
+                 "windows": num_windows, "stages": stages.rows}, f, indent=2)
@@ -0,0 +1,41 @@
+import numpy as np
+
+# Compact encodings for the detector: a window's 36 boolean features fit in
+# one uint64 (bit i = feature i), and so do sets of consequences/causes
+# (same bit numbering). Labels are only produced when results are written
+# out.
+
+NUM_FEATURES = 36
+FEATURE_BITS = np.uint64(1) << np.arange(NUM_FEATURES, dtype=np.uint64)
+
+def pack_features(features):
+  # (N, 36) or (36,) 0/1 features -> uint64 mask per window
+  features = np.asarray(features) == 1
+  return np.bitwise_or.reduce(np.where(features, FEATURE_BITS, np.uint64(0)), axis=-1)
+
+def unpack_features(masks):
+  # inverse of pack_features, float 0/1 like extract_feature
+  masks = np.asarray(masks, dtype=np.uint64)
+  return ((masks[..., np.newaxis] & FEATURE_BITS) != 0).astype(float)
+
+def indices_to_mask(indices):
+  mask = 0
+  for i in indices:
+    mask |= 1 << int(i)
+  return mask
+
+def mask_to_indices(mask):
+  mask = int(mask)
+  return [i for i in range(64) if (mask >> i) & 1]
+
+def mask_to_labels(mask, labels):
+  # e.g. mask_to_labels(causes, feature_to_str)
+  return [labels[i] for i in mask_to_indices(mask) if i in labels]
+
+def mask_columns(masks, labels):
+  # one 0/1 column per label for an array of masks
+  masks = np.asarray(masks, dtype=np.uint64)
+  columns = {}
+  for (i, label) in labels.items():
+    columns[label] = ((masks >> np.uint64(i)) & np.uint64(1)).astype(int)
+  return columns
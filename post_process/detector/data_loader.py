@@ -1,6 +1,9 @@
+from utils import *
 import numpy as np
 import scipy.io as sio
 import argparse
+import os
+from collections.abc import Mapping
 
 keys = ['time_dl_10mcs', 'time_dl_50mcs', 'time_dl_90mcs', 'time_dl_bitrate',
         'time_ul_10mcs', 'time_ul_50mcs', 'time_ul_90mcs',
@@ -28,10 +31,119 @@ def load_all_data(keys, datapath):
     feature_dict[keys[i]] = sio.loadmat(datapath + keys[i] + '.mat')[keys[i]]
   return feature_dict
 
+def mat_mtimes(keys, datapath):
+  return np.array([os.path.getmtime(datapath + key + '.mat') for key in keys])
+
+def pack_all_data(keys, datapath):
+  # one-time conversion of the .mat files into a single (2, total) array,
+  # series after series, plus an index of where each series starts.
+  # Series are copied one at a time so the conversion never holds more
+  # than one of them in memory.
+  mtimes = mat_mtimes(keys, datapath)
+  offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+  for (i, key) in enumerate(keys):
+    (name, shape, mat_class) = sio.whosmat(datapath + key + '.mat')[0]
+    offsets[i+1] = offsets[i] + shape[1]
+  # write to temporary names first so an interrupted run leaves no half cache
+  packed = np.lib.format.open_memmap(datapath + 'packed_data.tmp.npy', mode='w+',
+                                     dtype=np.float64, shape=(2, int(offsets[-1])))
+  for (i, key) in enumerate(keys):
+    packed[:, offsets[i]:offsets[i+1]] = sio.loadmat(datapath + key + '.mat')[key][:2, :]
+  packed.flush()
+  del packed
+  np.savez(datapath + 'packed_index.tmp.npz', keys=np.array(keys), offsets=offsets, mtimes=mtimes)
+  os.replace(datapath + 'packed_data.tmp.npy', datapath + 'packed_data.npy')
+  os.replace(datapath + 'packed_index.tmp.npz', datapath + 'packed_index.npz')
+
+class PackedSeries(Mapping):
+  # data_dict[key] interface over packed_data.npy. Every series is a view of
+  # the memory map, so only the slices a window actually reads are paged in.
+  def __init__(self, datapath, keys, offsets):
+    self.packed = np.load(datapath + 'packed_data.npy', mmap_mode='r')
+    self.offsets = {}
+    for (i, key) in enumerate(keys):
+      self.offsets[key] = (offsets[i], offsets[i+1])
+
+  def __getitem__(self, key):
+    (start, end) = self.offsets[key]
+    return self.packed[:, start:end]
+
+  def __iter__(self):
+    return iter(self.offsets)
+
+  def __len__(self):
+    return len(self.offsets)
+
+def load_packed_data(keys, datapath):
+  # lazy stand-in for load_all_data backed by packed_data.npy;
+  # (re)packs when any .mat file changed
+  index_file = datapath + 'packed_index.npz'
+  valid = False
+  if (os.path.exists(index_file) and os.path.exists(datapath + 'packed_data.npy')):
+    index = np.load(index_file)
+    valid = list(index['keys']) == list(keys) and \
+      np.array_equal(index['mtimes'], mat_mtimes(keys, datapath))
+  if (not valid):
+    pack_all_data(keys, datapath)
+    index = np.load(index_file)
+  return PackedSeries(datapath, keys, index['offsets'])
+
+def window_times(max_time, window_len, step_len):
+  # the (start, end) grid of the detector loop, accumulated the same way
+  start_times = []
+  end_times = []
+  start_time = 0
+  end_time = start_time + window_len
+  while (end_time < max_time):
+    start_times.append(start_time)
+    end_times.append(end_time)
+    start_time += step_len
+    end_time += step_len
+  return np.array(start_times, dtype=float), np.array(end_times, dtype=float)
+
+def build_window_index(data_dict, keys, window_len, step_len):
+  # get_window sample offsets of every window in every series,
+  # index[i, j] belongs to window i of keys[j]
+  max_time = np.min([data_dict[key][0, -1] for key in keys])
+  start_times, end_times = window_times(max_time, window_len, step_len)
+  index = np.zeros([start_times.shape[0], len(keys), 2], dtype=np.int64)
+  for (j, key) in enumerate(keys):
+    index[:, j, 0] = binary_search_all(data_dict[key][0, :], start_times)
+    index[:, j, 1] = binary_search_all(data_dict[key][0, :], end_times)
+  index[:, :, 1] = np.maximum(index[:, :, 1], index[:, :, 0])
+  return start_times, end_times, index
+
+# bumped when build_window_index changes what the offsets mean
+WINDOW_INDEX_VERSION = 2
+
+def load_window_index(data_dict, keys, datapath, window_len, step_len):
+  # build_window_index, cached in the data directory until the grid
+  # or any of the .mat files changes
+  cache_file = datapath + 'window_index.npz'
+  mtimes = mat_mtimes(keys, datapath)
+  if (os.path.exists(cache_file)):
+    cache = np.load(cache_file)
+    if ('version' in cache and cache['version'] == WINDOW_INDEX_VERSION
+        and list(cache['keys']) == list(keys) and np.array_equal(cache['mtimes'], mtimes)
+        and cache['window_len'] == window_len and cache['step_len'] == step_len):
+      return cache['start_times'], cache['end_times'], cache['index']
+  start_times, end_times, index = build_window_index(data_dict, keys, window_len, step_len)
+  # same temporary name + rename as pack_all_data, so a reader never sees
+  # a half-written index
+  np.savez(datapath + 'window_index.tmp.npz', version=WINDOW_INDEX_VERSION, keys=np.array(keys),
+           mtimes=mtimes, window_len=window_len, step_len=step_len, start_times=start_times,
+           end_times=end_times, index=index)
+  os.replace(datapath + 'window_index.tmp.npz', cache_file)
+  return start_times, end_times, index
+
 if __name__ == "__main__":
   parser = argparse.ArgumentParser()
   parser.add_argument('-d', '--directory', help="directory of the data")
+  parser.add_argument('-p', '--pack', action='store_true',
+                      help="pack the .mat files into packed_data.npy for fast loading")
   args = parser.parse_args()
 
+  if (args.pack):
+    pack_all_data(keys, args.directory)
   features = load_all_data(keys, args.directory)
   print(features)
\ No newline at end of file
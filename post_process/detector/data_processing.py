@@ -1,6 +1,8 @@
 from utils import *
 from data_loader import *
 import numpy as np
+import json
+import time
 
 # Causal chain 1: 
 #   5G DL cross traffic -> 5G DL congestion -> 
@@ -57,14 +59,10 @@ import numpy as np
 
 
 def get_window(data, start_time, end_time):
-  # find the start_time index
-  # print(data.shape)
-  # print(start_time, end_time)
+  # same offsets as build_window_index, which covers all sliding windows at
+  # once; for one window the scalar recursion is faster than binary_search_all
   start_idx = binary_search(data[0, :], start_time, 0, data[0, :].shape[0]-1)
   end_idx = binary_search(data[0, :], end_time, 0, data[0, :].shape[0]-1)
-  # print(data[0, start_idx], data[0, end_idx])
-  # print(data[1, start_idx], data[1, end_idx])
-
   return data[1, start_idx:end_idx]
 
 def extract_window(data_dict, start_time, end_time):
@@ -76,8 +74,99 @@ def extract_window(data_dict, start_time, end_time):
     windows[key] = get_window(data_array, start_time, end_time)
   return windows
 
+def slice_window(data_dict, bounds):
+  # window from one row of a build_window_index table
+  windows = {}
+  for (j, key) in enumerate(keys):
+    windows[key] = data_dict[key][1, bounds[j, 0]:bounds[j, 1]]
+  return windows
+
+''' Profiling: '''
+## Opt-in: enable_feature_profile() makes extract_feature record, per
+## feature, the wall time of its block, how often it ran and how often the
+## window had no data for it. Off by default; the "no data" messages are
+## only printed with print_missing_data(True).
+class FeatureProfile:
+  def __init__(self, num_features=36):
+    self.seconds = np.zeros(num_features)
+    self.calls = np.zeros(num_features, dtype=np.int64)
+    self.missing = np.zeros(num_features, dtype=np.int64)
+    self.windows = 0
+    self.last = 0
+
+  def start(self):
+    self.windows += 1
+    self.last = time.perf_counter()
+
+  def done(self, i):
+    now = time.perf_counter()
+    self.seconds[i] += now - self.last
+    self.calls[i] += 1
+    self.last = now
+
+  def merge(self, other):
+    self.seconds += other.seconds
+    self.calls += other.calls
+    self.missing += other.missing
+    self.windows += other.windows
+
+  def table(self):
+    # slowest features first
+    total = max(np.sum(self.seconds), 1e-12)
+    lines = ['{:>7} {:>10} {:>10} {:>7} {:>9}'.format(
+      'feature', 'seconds', 'us/call', 'share', 'missing')]
+    for i in np.argsort(-self.seconds, kind='stable'):
+      lines.append('{:>7} {:>10.4f} {:>10.1f} {:>6.1f}% {:>9}'.format(
+        i, self.seconds[i], 1e6 * self.seconds[i] / max(self.calls[i], 1),
+        100 * self.seconds[i] / total, self.missing[i]))
+    lines.append('{} windows, {:.3f} s in extract_feature'.format(self.windows, np.sum(self.seconds)))
+    return '\n'.join(lines)
+
+  def to_dict(self):
+    return {"windows": self.windows,
+            "features": [{"feature": i, "seconds": float(self.seconds[i]),
+                          "calls": int(self.calls[i]), "missing": int(self.missing[i])}
+                         for i in range(self.seconds.shape[0])]}
+
+  def write_json(self, filename):
+    with open(filename, 'w') as f:
+      json.dump(self.to_dict(), f, indent=2)
+
+feature_profile = None
+verbose_missing = False
+
+def enable_feature_profile():
+  global feature_profile
+  feature_profile = FeatureProfile()
+  return feature_profile
+
+def disable_feature_profile():
+  global feature_profile
+  profile = feature_profile
+  feature_profile = None
+  return profile
+
+def print_missing_data(enabled=True):
+  global verbose_missing
+  verbose_missing = enabled
+
+def feature_start():
+  if (feature_profile is not None):
+    feature_profile.start()
+
+def feature_done(i):
+  if (feature_profile is not None):
+    feature_profile.done(i)
+
+def missing_data(i):
+  if (feature_profile is not None):
+    feature_profile.missing[i] += 1
+  if (verbose_missing):
+    print('no data for feature {}'.format(i))
+
 def extract_feature(window, max_prb=0):
   feature = np.zeros(36)
+  feature_start()
 
   ''' Consequences: ''' 
   ## 0. bool: does UE inbound (DL) fps drops?
@@ -87,7 +176,8 @@ def extract_feature(window, max_prb=0):
     if ( min_framerate < 25 and max_framerate > 27):
       feature[0] = 1
   except:
-    print("no data for feature 0")
+    missing_data(0)
+  feature_done(0)
 
   ## 1. bool: does server inbound (UL) fps drops?
   try:
@@ -96,7 +186,8 @@ def extract_feature(window, max_prb=0):
     if ( min_framerate < 25 and max_framerate > 27):
       feature[1] = 1
   except:
-    print("no data for feature 1")
+    missing_data(1)
+  feature_done(1)
 
   ## 2. bool: does UE outbound (UL) framerate drops?
   try:
@@ -105,7 +196,8 @@ def extract_feature(window, max_prb=0):
     if ( min_framerate < 25 and max_framerate > 27):
       feature[2] = 1
   except:
-    print("no data for feature 2")
+    missing_data(2)
+  feature_done(2)
 
   ## 3. bool: does server outbound (DL) framerate drops?
   try:
@@ -114,7 +206,8 @@ def extract_feature(window, max_prb=0):
     if ( min_framerate < 25 and max_framerate > 27):
       feature[3] = 1
   except:
-    print("no data for feature 3")
+    missing_data(3)
+  feature_done(3)
 
   ## 4. bool: does UE outbound (UL) resolution drops?
   try:
@@ -124,7 +217,8 @@ def extract_feature(window, max_prb=0):
         feature[4] = 1
         break
   except:
-    print("no data for feature 4")
+    missing_data(4)
+  feature_done(4)
 
   ## 5. bool: does server outbound (DL) resolution drops?
   try:
@@ -134,7 +228,8 @@ def extract_feature(window, max_prb=0):
         feature[5] = 1
         break
   except:
-    print("no data for feature 5")
+    missing_data(5)
+  feature_done(5)
 
   ''' Intermediate States for GCC/WebRTC: '''
   ## 6. bool: does UE jitter buffer (DL) drain?
@@ -143,7 +238,8 @@ def extract_feature(window, max_prb=0):
     if (dl_jb.shape[0] > 1):
       feature[6] = 1
   except:
-    print('no data for feature 6')
+    missing_data(6)
+  feature_done(6)
 
   ## 7. bool: does server jitter buffer (UL) drain?
   try:
@@ -151,7 +247,8 @@ def extract_feature(window, max_prb=0):
     if (ul_jb.shape[0] > 1):
       feature[7] = 1
   except:
-    print('no data for feature 7')
+    missing_data(7)
+  feature_done(7)
 
   ## 8. bool: does UE target bit rate (UL) drop?
   try:
@@ -162,7 +259,8 @@ def extract_feature(window, max_prb=0):
         feature[8] = 1
         break
   except:
-    print('no data for feature 8')
+    missing_data(8)
+  feature_done(8)
   
   ## 9. bool: does server target bit rate (DL) drop?
   try:
@@ -173,7 +271,8 @@ def extract_feature(window, max_prb=0):
         feature[9] = 1
         break
   except:
-    print('no data for feature 9')
+    missing_data(9)
+  feature_done(9)
 
   ## 10. bool: does UE gcc detects overuse (UL)?
   try:
@@ -183,7 +282,8 @@ def extract_feature(window, max_prb=0):
         feature[10] = 1
         break
   except:
-    print('no data for feature 10')
+    missing_data(10)
+  feature_done(10)
 
   ## 11. bool: does server gcc detects overuse (DL)?
   try:
@@ -193,7 +293,8 @@ def extract_feature(window, max_prb=0):
         feature[11] = 1
         break
   except:
-    print('no data for feature 11')
+    missing_data(11)
+  feature_done(11)
 
   ## 12. bool: does UE pushback rate (UL) drop? 
   try:
@@ -203,7 +304,8 @@ def extract_feature(window, max_prb=0):
         feature[12] = 1
         break
   except:
-    print('no data for feature 12')
+    missing_data(12)
+  feature_done(12)
 
   ## 13. bool: does server pushback rate (DL) drop?
   try:
@@ -213,7 +315,8 @@ def extract_feature(window, max_prb=0):
         feature[13] = 1
         break
   except:
-    print('no data for feature 13')
+    missing_data(13)
+  feature_done(13)
 
   ## 14. bool: does UE congestion window (UL) full?
   try:
@@ -224,7 +327,8 @@ def extract_feature(window, max_prb=0):
         feature[14] = 1
         break
   except:
-    print('no data for feature 14')
+    missing_data(14)
+  feature_done(14)
 
   # 15. bool: does server congestion window (DL) full?
   try:
@@ -235,7 +339,8 @@ def extract_feature(window, max_prb=0):
         feature[15] = 1
         break
   except:
-    print('no data for feature 15')
+    missing_data(15)
+  feature_done(15)
 
   ## 16. bool: does UE outstanding bytes (UL) increase?
   try:
@@ -250,7 +355,8 @@ def extract_feature(window, max_prb=0):
         feature[16] = 1
         break
   except:
-    print('no data for feature 16')
+    missing_data(16)
+  feature_done(16)
 
   ## 17. bool: does server outstanding bytes (DL) increase?
   try:
@@ -265,7 +371,8 @@ def extract_feature(window, max_prb=0):
         feature[17] = 1
         break
   except:
-    print('no data for feature 17')
+    missing_data(17)
+  feature_done(17)
 
   ''' Center: '''
   ## 18. bool: does DL delay increase?
@@ -281,7 +388,8 @@ def extract_feature(window, max_prb=0):
         feature[18] = 1
         break
   except:
-    print('no data for feature 18')
+    missing_data(18)
+  feature_done(18)
 
   ## 19. bool: does UL delay increase?
   try:
@@ -296,7 +404,8 @@ def extract_feature(window, max_prb=0):
         feature[19] = 1
         break
   except:
-    print('no data for feature 19')
+    missing_data(19)
+  feature_done(19)
 
   ''' 5G States: '''
   ## 20: bool: does UL/DL rnti change?
@@ -307,7 +416,8 @@ def extract_feature(window, max_prb=0):
         feature[20] = 1
         break;
   else:
-    print('no data for feature 20')
+    missing_data(20)
+  feature_done(20)
 
   ## 21. bool: does UL allocated TBS drop?
   try:
@@ -317,7 +427,8 @@ def extract_feature(window, max_prb=0):
       feature[21] = 1
   except:
     feature[21] = 1
-    print('np data fro feature 21')
+    missing_data(21)
+  feature_done(21)
 
   ## 22. bool: does DL allocated TBS drop? 
   try:
@@ -327,18 +438,21 @@ def extract_feature(window, max_prb=0):
       feature[22] = 1
   except:
     feature[22] = 1
-    print('np data fro feature 21')
+    missing_data(22)
+  feature_done(22)
 
 
   ## 23. bool: does UL app bitrate > UL rate?
   diff = window['time_ul_pkt'] - window['time_ul_tbs']
   if (np.sum(diff > 0) > 0.1 * window['time_ul_pkt'].shape[0]):
     feature[23] = 1
+  feature_done(23)
 
   ## 24. bool: does DL app bitrate > DL rate?
   diff = window['time_dl_pkt'] - window['time_dl_tbs']
   if (np.sum(diff > 0) > 0.1 * window['time_dl_pkt'].shape[0]):
     feature[24] = 1
+  feature_done(24)
 
   ## 25. bool: are there other DL UE traffic?
   ct_thres = 0.2
@@ -349,6 +463,7 @@ def extract_feature(window, max_prb=0):
   if (np.max(dl_prb_interest) + np.max(dl_prb_others) > 0.8*max_prb):
     if (np.sum(dl_prb_others) / (np.sum(dl_prb_interest)+np.sum(dl_prb_others)) > ct_thres):
       feature[25] = 1
+  feature_done(25)
 
   ## 26. bool: are there other UL UE traffic?
   dl_prb_interest = window['time_ul_prb_interest']
@@ -358,6 +473,7 @@ def extract_feature(window, max_prb=0):
   if (np.max(dl_prb_interest) + np.max(dl_prb_others) > 0.8*max_prb):
     if (np.sum(dl_prb_others) / (np.sum(dl_prb_interest)+np.sum(dl_prb_others)) > ct_thres):
       feature[26] = 1
+  feature_done(26)
 
   channel_thres = 10
   ## 27. bool: is the UL channel bad?
@@ -379,6 +495,7 @@ def extract_feature(window, max_prb=0):
     if (counter > 10 and np.max(window['time_ul_90mcs']) < 20):
       feature[27] = 1
       break
+  feature_done(27)
 
   ## 28. bool: is the DL channel bad? 
   dl_mcs_50 = window['time_dl_50mcs']
@@ -398,9 +515,11 @@ def extract_feature(window, max_prb=0):
     if (counter > 10 and np.max(window['time_dl_90mcs']) < 20):
       feature[28] = 1
       break
+  feature_done(28)
 
   ## 29. bool: is there UL scheduling delay?
   feature[29] = 1
+  feature_done(29)
 
   ## 30. bool: are there UL HARQ retransmissions?
   ul_harq = window['time_ul_rtx']
@@ -410,6 +529,7 @@ def extract_feature(window, max_prb=0):
     if (counter > 20):
       feature[30] = 1
       break
+  feature_done(30)
 
   ## 31. bool: are there DL HARQ retransmissions?
   dl_harq = window['time_dl_rtx']
@@ -419,21 +539,26 @@ def extract_feature(window, max_prb=0):
     if (counter > 20):
       feature[31] = 1
       break
+  feature_done(31)
 
   ## 32. bool: are there UL RLC retransmissions?
   feature[32] = 0
+  feature_done(32)
   ## 33. bool: are there DL RLC retransmissions?
   feature[33] = 0
+  feature_done(33)
   ## 34. bool: does UL pushback rate is not equal to target bit rate?
   pb_target = window['time_ul_pushback'] - window['time_ul_loss_based_rate']
   # print(pb_target)
   if (sum(pb_target) != 0):
     feature[34] = 1
+  feature_done(34)
   
   ## 35. bool: does DL pushback rate is not equal to target bit rate?
   pb_target = window['time_dl_pushback'] - window['time_dl_loss_based_rate']
   # print(pb_target)
   if (sum(pb_target) != 0):
     feature[35] = 1
+  feature_done(35)
 
   return feature
\ No newline at end of file
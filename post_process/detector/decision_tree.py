@@ -1,10 +1,13 @@
 from data_loader import *
 from utils import *
 from data_processing import *
+from batch_features import *
+from bitmask import *
 import argparse
 import matplotlib.pyplot as plt
-from generated_chain_search import *
+from generated_chain_search_final import *
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 ''' Features: '''
 ''' Consequences: ''' 
@@ -71,7 +74,7 @@ feature_to_str = {0: "UE inbound FPS drops",
 WINDOW_LEN = 5
 STEP_LEN = 0.5
 
-def back_trace(features):
+def back_trace(feature):
   consequences = set()
   causes = set()
   source_to_sink = ''
@@ -302,78 +305,179 @@ def detect_fast_recovery(window, feature, is_dl):
     return False    
 
 
-if __name__ == '__main__':
-  parser = argparse.ArgumentParser()
-  parser.add_argument('-d', '--directory', help="directory of the data")
-  args = parser.parse_args()
+def new_results():
+  # One row per detected window; consequences and causes are kept as
+  # bitmasks over feature_to_str and only turned into columns on output
+  return {"Start Time": [], "End Time": [], "Consequences": [], "Causes": [],
+          "Fast Recovery": [], "Chains": []}
 
-  data_dict = load_all_data(keys, args.directory)
+def merge_results(results, more):
+  for key in results.keys():
+    results[key].extend(more[key])
+  return results
 
-  duration = []
-  for key in keys:
-    duration.append(data_dict[key][0, -1])
-    # print('{} with length {}'.format(key, data_dict[key].shape))
-  max_time = np.min(duration)
-  # print(max_time)
+def results_to_columns(results):
+  # the events_detection.csv layout: one 0/1 column per feature_to_str label
+  flags = np.array(results["Consequences"], dtype=np.uint64) | \
+          np.array(results["Causes"], dtype=np.uint64)
+  columns = {"Start Time": results["Start Time"],
+             "End Time": results["End Time"]}
+  # coalesced events also carry their length
+  for key in ["Duration", "Windows"]:
+    if key in results:
+      columns[key] = results[key]
+  columns.update(mask_columns(flags, feature_to_str))
+  columns["Fast Recovery"] = results["Fast Recovery"]
+  columns["Chains"] = results["Chains"]
+  return columns
 
-  # plt.figure()
-  # plt.plot(data_dict['time_ul_prb_others'][1, :])
-  # plt.plot(data_dict['time_dl_prb_others'][1, :])
-  # plt.show()
+def coalesce_events(results, step_len=STEP_LEN):
+  # Merge runs of consecutive windows (one step apart, so overlapping) with
+  # the same consequences, causes and chains into one event each
+  start_times = np.array(results["Start Time"], dtype=float)
+  end_times = np.array(results["End Time"], dtype=float)
+  consequences = np.array(results["Consequences"], dtype=np.uint64)
+  causes = np.array(results["Causes"], dtype=np.uint64)
+  fast_recovery = np.array(results["Fast Recovery"], dtype=int)
+  chains = np.array(results["Chains"], dtype=object)
+  num_windows = start_times.shape[0]
+  if (num_windows == 0):
+    return {"Start Time": [], "End Time": [], "Duration": [], "Windows": [],
+            "Consequences": [], "Causes": [], "Fast Recovery": [], "Chains": []}
 
-  # plt.figure()
-  # plt.plot(data_dict['time_dl_tbs'][1, :])
-  # plt.plot(data_dict['time_dl_pkt'][1, :])
-  # plt.show()
+  is_first = np.ones(num_windows, dtype=bool)
+  is_first[1:] = ~(np.isclose(start_times[1:] - start_times[:-1], step_len) &
+                   (consequences[1:] == consequences[:-1]) &
+                   (causes[1:] == causes[:-1]) & (chains[1:] == chains[:-1]))
+  first = np.nonzero(is_first)[0]
+  last = np.append(first[1:], num_windows) - 1
+  return {"Start Time": list(start_times[first]),
+          "End Time": list(end_times[last]),
+          "Duration": list(end_times[last] - start_times[first]),
+          "Windows": list(last - first + 1),
+          "Consequences": list(consequences[first]),
+          "Causes": list(causes[first]),
+          # fast recovery in any window of the event
+          "Fast Recovery": list(np.maximum.reduceat(fast_recovery, first)),
+          "Chains": list(chains[first])}
 
-  start_time = 0
-  end_time = start_time + WINDOW_LEN
+def append_event(results, start_time, end_time, window, feature, result):
+  # one row of results for a window where back_trace found consequences
+  is_fast_recovery = False
+  if (1 in result[0] or 2 in result[0] or 4 in result[0]):
+    # uplink target bit rate
+    is_fast_recovery = detect_fast_recovery(window, feature, is_dl=False)
+  if (0 in result[0] or 3 in result[0] or 5 in result[0]):
+    # downlink target bit rate
+    is_fast_recovery = detect_fast_recovery(window, feature, is_dl=True)
+  results["Start Time"].append(start_time)
+  results["End Time"].append(end_time)
+  results["Consequences"].append(indices_to_mask(result[0]))
+  results["Causes"].append(indices_to_mask(result[1]))
+  results["Fast Recovery"].append(1 if is_fast_recovery else 0)
+  results['Chains'].append(result[2])
+  # print("    {} caused by {}, fast recovery {}".format(
+  #   mask_to_labels(results["Consequences"][-1], feature_to_str),
+  #   mask_to_labels(results["Causes"][-1], feature_to_str), is_fast_recovery))
 
-  # Initialize the results dict
-  results = {"Start Time": [],
-             "End Time": []}
-  for key in feature_to_str.keys():
-    results[feature_to_str[key]] = []
-  results["Fast Recovery"] = []
-  results["Chains"] = []
-  
-  while (True):
-    if (end_time >= max_time):
-      break
-    window = extract_window(data_dict, start_time, end_time)
-    feature = extract_feature(window)
+def detect_windows(data_dict, start_times, end_times, window_index, first, last,
+                   per_window=False):
+  # results rows of the windows first..last-1 of window_index
+  results = new_results()
+  # features of every window at once, see batch_features.py, one row per
+  # window like extract_feature
+  if (not per_window):
+    all_features = extract_all_features(
+      data_dict, start_times[first:last], end_times[first:last],
+      window_index=window_index[first:last])
+
+  for window_idx in range(first, last):
+    start_time = start_times[window_idx]
+    end_time = end_times[window_idx]
+    if (per_window):
+      window = slice_window(data_dict, window_index[window_idx])
+      feature = extract_feature(window)
+    else:
+      feature = all_features[window_idx - first]
     result = back_trace(feature)
     # print("start time: {}, end_time: {}".format(start_time, end_time))
     if (len(result[0]) != 0):
-      for key in results.keys():
-        if (key != 'Chains'):
-          results[key].append(0)
-      results["Start Time"][-1] = start_time
-      results["End Time"][-1] = end_time
-      consequence_list = []
-      cause_list = []
-      for i in result[0]:
-        consequence_list.append(feature_to_str[i])
-        results[feature_to_str[i]][-1] = 1;
-      for i in result[1]:
-        cause_list.append(feature_to_str[i])
-        results[feature_to_str[i]][-1] = 1;
-      is_fast_recovery = False
-      if (1 in result[0] or 2 in result[0] or 4 in result[0]):
-        # uplink target bit rate
-        is_fast_recovery = detect_fast_recovery(window, feature, is_dl=False)
-      if (0 in result[0] or 3 in result[0] or 5 in result[0]):
-        # downlink target bit rate
-        is_fast_recovery = detect_fast_recovery(window, feature, is_dl=True)
-      if(is_fast_recovery):
-        results["Fast Recovery"][-1] = 1
-      results['Chains'].append(result[2])
-      # print("    {} caused by {}, fast recovery {}".format(consequence_list, 
-      #   cause_list, is_fast_recovery))
-    
-    start_time += STEP_LEN
-    end_time += STEP_LEN
+      if (not per_window):
+        # raw window is only needed for the fast recovery check
+        window = slice_window(data_dict, window_index[window_idx])
+      append_event(results, start_time, end_time, window, feature, result)
+  return results
+
+def detect_shard(directory, first, last, per_window=False, profile=False):
+  # worker side of run_detection(shards=N): the packed series are memory
+  # mapped, so all workers share one copy through the page cache.
+  # Returns the results and, with profile, this worker's FeatureProfile.
+  if (profile):
+    enable_feature_profile()
+  data_dict = load_packed_data(keys, directory)
+  start_times, end_times, window_index = load_window_index(
+    data_dict, keys, directory, WINDOW_LEN, STEP_LEN)
+  results = detect_windows(data_dict, start_times, end_times, window_index, first, last, per_window)
+  return results, disable_feature_profile() if profile else None
+
+def run_detection(directory, per_window=False, shards=1, profile=None):
+  # detect events over one experiment and write events_detection.csv.
+  # profile: FeatureProfile the shard workers' profiles are merged into
+  # memory-mapped copy of the .mat files, packed on the first run
+  data_dict = load_packed_data(keys, directory)
+  # sample offsets of every window, cached next to the .mat files
+  start_times, end_times, window_index = load_window_index(
+    data_dict, keys, directory, WINDOW_LEN, STEP_LEN)
+  num_windows = start_times.shape[0]
+
+  if (shards > 1):
+    # split the windows into consecutive shards, each worker slices the
+    # samples its windows cover (overlaps included) out of the shared map
+    bounds = np.linspace(0, num_windows, shards + 1).astype(int)
+    results = new_results()
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+      futures = [pool.submit(detect_shard, directory, bounds[i], bounds[i+1], per_window,
+                             profile is not None)
+                 for i in range(shards)]
+      # stitch in time order
+      for future in futures:
+        (shard_results, shard_profile) = future.result()
+        merge_results(results, shard_results)
+        if (profile is not None):
+          profile.merge(shard_profile)
+  else:
+    results = detect_windows(data_dict, start_times, end_times, window_index,
+                             0, num_windows, per_window)
 
   # Save DataFrame to CSV
-  df = pd.DataFrame(results)
-  df.to_csv(args.directory + 'events_detection.csv', index=False)
\ No newline at end of file
+  df = pd.DataFrame(results_to_columns(results))
+  df.to_csv(directory + 'events_detection.csv', index=False)
+  # one row per event instead of per window
+  events = pd.DataFrame(results_to_columns(coalesce_events(results)))
+  events.to_csv(directory + 'events_coalesced.csv', index=False)
+  return df
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-d', '--directory', help="directory of the data")
+  parser.add_argument('--per-window', action='store_true',
+                      help="extract features window by window instead of in one batch")
+  parser.add_argument('-s', '--shards', type=int, default=1,
+                      help="split the trace into this many time shards run in parallel")
+  parser.add_argument('--profile', nargs='?', const='', default=None, metavar='JSON',
+                      help="time every feature of extract_feature (implies --per-window), "
+                           "optionally also saved as JSON")
+  parser.add_argument('--print-missing', action='store_true',
+                      help="print a line for every window with no data for a feature")
+  args = parser.parse_args()
+
+  print_missing_data(args.print_missing)
+  if (args.profile is not None):
+    # the batch engine does not go through extract_feature
+    profile = enable_feature_profile()
+    run_detection(args.directory, True, args.shards, profile)
+    print(profile.table())
+    if (args.profile != ''):
+      profile.write_json(args.profile)
+  else:
+    run_detection(args.directory, args.per_window, args.shards)
\ No newline at end of file
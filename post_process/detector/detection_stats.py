@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# Counts behind plot_causes.py, plot_heatmap.py and plot_consequence.py,
+# computed with column operations on the events_detection.csv files.
+
+''' Data Loading '''
+# 0416 5min, 0417 5min, 0418 10min, 0419 10min, 0420 10min, 0421 30min, 0422 30min, 0423 30min, 0426 30min
+commercial_id = ['0416', '0417', '0418', '0419', '0422', '0423'] # 5 + 5 + 10 + 10 + 30 + 30 = 90
+private_id = ['0420', '0421', '0426'] # 10 + 30 + 30 = 70
+data_path = "~/Documents/data/athena/"
+
+# experiment id -> counted rows, so several plots in one session read each file once
+loaded_events = {}
+
+def first_rows(data):
+  # Dedup rule of the plots: a row repeating the previous row 0.5 s later
+  # (same values in every column after the times) is the same incident.
+  # Empty chains read back as NaN and never compare equal, as before.
+  same = (data.iloc[:, 0] - data.iloc[:, 0].shift() == 0.5) & \
+    (data.iloc[:, 2:] == data.iloc[:, 2:].shift()).all(axis=1)
+  return data[~same]
+
+def load_events(experiment_ids, path=data_path):
+  # counted rows of all the experiments, one DataFrame
+  frames = []
+  for experiment_id in experiment_ids:
+    if experiment_id not in loaded_events:
+      file_name = path + "data_exp" + experiment_id + '/detection_data/events_detection.csv'
+      loaded_events[experiment_id] = first_rows(pd.read_csv(file_name))
+    frames.append(loaded_events[experiment_id])
+  return pd.concat(frames, ignore_index=True)
+
+def column(events, name):
+  # a misspelled or unwritten label raises KeyError instead of counting as 0
+  return events[name].to_numpy()
+
+def cause_counts(events):
+  #[r"Poor Channel", r"Cross Traffic", r"UL Scheduling", r"HARQ ReTX", r"RLC ReTX", r"RRC State"]
+  groups = [["UL channel is bad", "DL channel is bad"],
+            ["UL cross traffic", "DL cross traffic"],
+            ["UL scheduling delay"],
+            ["DL HARQ retx", "UL HARQ retx"],
+            ["DL RLC retx", "UL RLC retx"],
+            ["RNTI changes"]]
+  return np.array([sum(np.sum(column(events, name)) for name in group) for group in groups],
+                  dtype=float)
+
+def consequence_counts(events):
+  #[r"Client inbound FPS", r"Server inbound FPS"]
+  # the outbound FPS/resolution drops (features 2-5) are not detected, so
+  # the detector writes no columns for them
+  return np.array([
+    np.sum(column(events, "UE inbound FPS drops")),
+    np.sum(column(events, "Server inbound FPS drops"))], dtype=float)
+
+def consequence_totals(events):
+  # [fps, target bitrate, pushback rate] drops at either end
+  groups = [['UE inbound FPS drops', 'Server inbound FPS drops'],
+            ['UE target bitrate drops', 'Server target bitrate drops'],
+            ['UE pushback rate drops', 'Server pushback rate drops']]
+  return np.array([sum(np.sum(column(events, name)) for name in group) for group in groups],
+                  dtype=float)
+
+def chain_counts(events):
+  # chains '<cause>-<consequence>,' -> counts[consequence-1, cause-1], repeats included
+  counts = np.zeros((3, 7))
+  chains = events["Chains"]
+  chains = chains[chains.map(lambda strings: type(strings) == type('a'))]
+  pairs = chains.str.extractall(r'(\d+)-(\d+)')
+  if (pairs.shape[0] > 0):
+    np.add.at(counts, (pairs[1].astype(int).to_numpy() - 1, pairs[0].astype(int).to_numpy() - 1), 1)
+  return counts
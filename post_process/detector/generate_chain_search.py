@@ -1,3 +1,5 @@
+import hashlib
+
 text_to_feature_idx = {'local_inbound_fps_down': 0, 
                        'remote_inbound_fps_down': 1, 
                        'local_outbound_fps_down': 2, 
@@ -104,24 +106,129 @@ def generate_code(tree, indent=1):
         #     code_lines.append('  ' * (indent + 1) + '# unknown cause"')
     return code_lines
 
+def function_source(tree, func_name="backward_trace"):
+    """Source of the nested-if chain search function for the tree."""
+    global causal_idx
+    causal_idx = 1  # number chains from 1 on every call
+    lines = [f"def {func_name}(features):",
+             f"  chains = []",
+             f"  causes = set()",
+             f"  consequences = set()"]
+    lines.extend(generate_code(tree, indent=1))
+    lines.append('  return [consequences, causes, chains]')
+    return '\n'.join(lines)
+
 # to improve the unknown cause when there is an event
 def write_function_to_file(tree, filename="decision_tree_generated.py", func_name="backward_trace"):
     with open(filename, 'w+') as f:
-        f.write(f"def {func_name}(features):\n")
-        f.write(f"  chains = []\n")
-        f.write(f"  causes = set()\n")
-        f.write(f"  consequences = set()\n")
-        
-        code_lines = generate_code(tree, indent=1)
-        for line in code_lines:
-            f.write(line + '\n')
-        f.write('  return [consequences, causes, chains]')
+        f.write(function_source(tree, func_name))
     print(f"✅ Function written to: {filename}")
 
+def expr_to_mask(expr):
+    """Convert 'A or B' to 'f[:, a] | f[:, b]' over a boolean feature matrix."""
+    expr = expr.replace("(", "( ").replace(")", " )")
+    new_tokens = []
+    for token in expr.split():
+        if token == 'and':
+            new_tokens.append('&')
+        elif token == 'or':
+            new_tokens.append('|')
+        elif token == 'not':
+            new_tokens.append('~')
+        elif token in ['(', ')']:
+            new_tokens.append(token)
+        else:
+            new_tokens.append(f"f[:, {text_to_feature_idx[token]}]")
+    return ' '.join(new_tokens)
+
+def generate_vectorized_code(tree, parent=None, counter=None):
+    """Generate NumPy code evaluating the logic tree on all windows at once.
+
+    Every tree node becomes one boolean mask over the windows (its condition
+    AND its parent's mask); consequences, causes and chains are OR-ed into
+    per-window uint64 bitmasks. Chains are numbered like generate_code.
+    """
+    if counter is None:
+        counter = {'chain': 1, 'mask': 0}
+    code_lines = []
+    for expr, subtree in tree.items():
+        counter['mask'] += 1
+        mask = f"m{counter['mask']}"
+        condition = expr_to_mask(expr)
+        if parent is None:
+            code_lines.append(f"  {mask} = {condition}")
+            for feature in expr.split():
+                code_lines.append(f"  consequences |= np.where({mask}, BIT[{text_to_feature_idx[feature]}], ZERO)"
+                                  " # record consequence")
+        else:
+            code_lines.append(f"  {mask} = {parent} & ({condition})")
+        if subtree:
+            code_lines.extend(generate_vectorized_code(subtree, mask, counter))
+        else:
+            if counter['chain'] > 64:
+                raise ValueError("more than 64 causal chains do not fit in a uint64 bitmask")
+            code_lines.append(f"  chains |= np.where({mask}, BIT[{counter['chain'] - 1}], ZERO)"
+                              f" # Causal chain {counter['chain']}")
+            for feature in expr.split():
+                code_lines.append(f"  causes |= np.where({mask}, BIT[{text_to_feature_idx[feature]}], ZERO)"
+                                  " # record cause")
+            counter['chain'] += 1
+    return code_lines
+
+def vectorized_function_source(tree, func_name="backward_trace_vectorized"):
+    """Source of the vectorized chain search module for the tree."""
+    lines = ["import numpy as np",
+             "",
+             "BIT = [np.uint64(1) << np.uint64(i) for i in range(64)]",
+             "ZERO = np.uint64(0)",
+             "",
+             f"def {func_name}(features):",
+             f"  # features: (N, 36) matrix, one row per window; returns uint64",
+             f"  # bitmasks per window (bit i of chains is causal chain i + 1)",
+             f"  f = np.asarray(features) == 1",
+             f"  chains = np.zeros(f.shape[0], dtype=np.uint64)",
+             f"  causes = np.zeros(f.shape[0], dtype=np.uint64)",
+             f"  consequences = np.zeros(f.shape[0], dtype=np.uint64)"]
+    lines.extend(generate_vectorized_code(tree))
+    lines.append('  return [consequences, causes, chains]')
+    return '\n'.join(lines)
+
+def write_vectorized_function_to_file(tree, filename="decision_tree_vectorized.py",
+                                      func_name="backward_trace_vectorized"):
+    with open(filename, 'w+') as f:
+        f.write(vectorized_function_source(tree, func_name))
+    print(f"✅ Function written to: {filename}")
+
+# compiled chain searches, keyed on (sha256 of the chain file, vectorized)
+compiled_chain_searches = {}
+
+def compile_chain_search(filename, vectorized=False):
+    """Build the chain tree of a chain file and compile it straight to a callable.
+
+    Nothing is written to disk; the function is cached on the hash of the
+    file contents, so an edited chain file is recompiled on the next call.
+    """
+    with open(filename, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    key = (digest, vectorized)
+    if key not in compiled_chain_searches:
+        tree = build_tree(read_chains(filename))
+        if vectorized:
+            func_name = "backward_trace_vectorized"
+            source = vectorized_function_source(tree, func_name)
+        else:
+            func_name = "backward_trace"
+            source = function_source(tree, func_name)
+        namespace = {}
+        exec(compile(source, f"<chain search {filename}>", 'exec'), namespace)
+        compiled_chain_searches[key] = namespace[func_name]
+    return compiled_chain_searches[key]
+
 def main():
     chains = read_chains("input_final.txt")  # Your causal chains go here
     tree = build_tree(chains)
     write_function_to_file(tree, filename="generated_chain_search_final.py")
+    write_vectorized_function_to_file(tree, filename="generated_chain_search_final_vectorized.py")
 
     # chains = read_chains("input_demo.txt")  # Your causal chains go here
     # tree = build_tree(chains)
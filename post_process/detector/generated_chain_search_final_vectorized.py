@@ -0,0 +1,153 @@
+import numpy as np
+
+BIT = [np.uint64(1) << np.uint64(i) for i in range(64)]
+ZERO = np.uint64(0)
+
+def backward_trace_vectorized(features):
+  # features: (N, 36) matrix, one row per window; returns uint64
+  # bitmasks per window (bit i of chains is causal chain i + 1)
+  f = np.asarray(features) == 1
+  chains = np.zeros(f.shape[0], dtype=np.uint64)
+  causes = np.zeros(f.shape[0], dtype=np.uint64)
+  consequences = np.zeros(f.shape[0], dtype=np.uint64)
+  m1 = f[:, 0]
+  consequences |= np.where(m1, BIT[0], ZERO) # record consequence
+  m2 = m1 & (f[:, 6])
+  m3 = m2 & (f[:, 18])
+  m4 = m3 & (f[:, 20])
+  chains |= np.where(m4, BIT[0], ZERO) # Causal chain 1
+  causes |= np.where(m4, BIT[20], ZERO) # record cause
+  m5 = m3 & (f[:, 23] | f[:, 24])
+  m6 = m5 & (f[:, 28])
+  chains |= np.where(m6, BIT[1], ZERO) # Causal chain 2
+  causes |= np.where(m6, BIT[28], ZERO) # record cause
+  m7 = m5 & (f[:, 25])
+  chains |= np.where(m7, BIT[2], ZERO) # Causal chain 3
+  causes |= np.where(m7, BIT[25], ZERO) # record cause
+  m8 = m3 & (f[:, 31])
+  chains |= np.where(m8, BIT[3], ZERO) # Causal chain 4
+  causes |= np.where(m8, BIT[31], ZERO) # record cause
+  m9 = f[:, 1]
+  consequences |= np.where(m9, BIT[1], ZERO) # record consequence
+  m10 = m9 & (f[:, 7])
+  m11 = m10 & (f[:, 19])
+  m12 = m11 & (f[:, 20])
+  chains |= np.where(m12, BIT[4], ZERO) # Causal chain 5
+  causes |= np.where(m12, BIT[20], ZERO) # record cause
+  m13 = m11 & (f[:, 23] | f[:, 24])
+  m14 = m13 & (f[:, 27])
+  chains |= np.where(m14, BIT[5], ZERO) # Causal chain 6
+  causes |= np.where(m14, BIT[27], ZERO) # record cause
+  m15 = m13 & (f[:, 26])
+  chains |= np.where(m15, BIT[6], ZERO) # Causal chain 7
+  causes |= np.where(m15, BIT[26], ZERO) # record cause
+  m16 = m11 & (f[:, 30])
+  chains |= np.where(m16, BIT[7], ZERO) # Causal chain 8
+  causes |= np.where(m16, BIT[30], ZERO) # record cause
+  m17 = m11 & (f[:, 29])
+  chains |= np.where(m17, BIT[8], ZERO) # Causal chain 9
+  causes |= np.where(m17, BIT[29], ZERO) # record cause
+  m18 = f[:, 12]
+  consequences |= np.where(m18, BIT[12], ZERO) # record consequence
+  m19 = m18 & (f[:, 34] | f[:, 35])
+  m20 = m19 & (f[:, 18])
+  m21 = m20 & (f[:, 20])
+  chains |= np.where(m21, BIT[9], ZERO) # Causal chain 10
+  causes |= np.where(m21, BIT[20], ZERO) # record cause
+  m22 = m20 & (f[:, 23] | f[:, 24])
+  m23 = m22 & (f[:, 28])
+  chains |= np.where(m23, BIT[10], ZERO) # Causal chain 11
+  causes |= np.where(m23, BIT[28], ZERO) # record cause
+  m24 = m22 & (f[:, 25])
+  chains |= np.where(m24, BIT[11], ZERO) # Causal chain 12
+  causes |= np.where(m24, BIT[25], ZERO) # record cause
+  m25 = m20 & (f[:, 31])
+  chains |= np.where(m25, BIT[12], ZERO) # Causal chain 13
+  causes |= np.where(m25, BIT[31], ZERO) # record cause
+  m26 = m19 & (f[:, 19])
+  m27 = m26 & (f[:, 20])
+  chains |= np.where(m27, BIT[13], ZERO) # Causal chain 14
+  causes |= np.where(m27, BIT[20], ZERO) # record cause
+  m28 = m26 & (f[:, 23] | f[:, 24])
+  m29 = m28 & (f[:, 27])
+  chains |= np.where(m29, BIT[14], ZERO) # Causal chain 15
+  causes |= np.where(m29, BIT[27], ZERO) # record cause
+  m30 = m28 & (f[:, 26])
+  chains |= np.where(m30, BIT[15], ZERO) # Causal chain 16
+  causes |= np.where(m30, BIT[26], ZERO) # record cause
+  m31 = m28 & (f[:, 29])
+  chains |= np.where(m31, BIT[16], ZERO) # Causal chain 17
+  causes |= np.where(m31, BIT[29], ZERO) # record cause
+  m32 = m26 & (f[:, 30])
+  chains |= np.where(m32, BIT[17], ZERO) # Causal chain 18
+  causes |= np.where(m32, BIT[30], ZERO) # record cause
+  m33 = m18 & (~ ( f[:, 34] | f[:, 35] ))
+  m34 = m33 & (f[:, 19])
+  m35 = m34 & (f[:, 20])
+  chains |= np.where(m35, BIT[18], ZERO) # Causal chain 19
+  causes |= np.where(m35, BIT[20], ZERO) # record cause
+  m36 = m34 & (f[:, 23] | f[:, 24])
+  m37 = m36 & (f[:, 27])
+  chains |= np.where(m37, BIT[19], ZERO) # Causal chain 20
+  causes |= np.where(m37, BIT[27], ZERO) # record cause
+  m38 = m36 & (f[:, 26])
+  chains |= np.where(m38, BIT[20], ZERO) # Causal chain 21
+  causes |= np.where(m38, BIT[26], ZERO) # record cause
+  m39 = m34 & (f[:, 30])
+  chains |= np.where(m39, BIT[21], ZERO) # Causal chain 22
+  causes |= np.where(m39, BIT[30], ZERO) # record cause
+  m40 = m34 & (f[:, 29])
+  chains |= np.where(m40, BIT[22], ZERO) # Causal chain 23
+  causes |= np.where(m40, BIT[29], ZERO) # record cause
+  m41 = f[:, 13]
+  consequences |= np.where(m41, BIT[13], ZERO) # record consequence
+  m42 = m41 & (f[:, 34] | f[:, 35])
+  m43 = m42 & (f[:, 19])
+  m44 = m43 & (f[:, 20])
+  chains |= np.where(m44, BIT[23], ZERO) # Causal chain 24
+  causes |= np.where(m44, BIT[20], ZERO) # record cause
+  m45 = m43 & (f[:, 23] | f[:, 24])
+  m46 = m45 & (f[:, 27])
+  chains |= np.where(m46, BIT[24], ZERO) # Causal chain 25
+  causes |= np.where(m46, BIT[27], ZERO) # record cause
+  m47 = m45 & (f[:, 26])
+  chains |= np.where(m47, BIT[25], ZERO) # Causal chain 26
+  causes |= np.where(m47, BIT[26], ZERO) # record cause
+  m48 = m43 & (f[:, 30])
+  chains |= np.where(m48, BIT[26], ZERO) # Causal chain 27
+  causes |= np.where(m48, BIT[30], ZERO) # record cause
+  m49 = m43 & (f[:, 29])
+  chains |= np.where(m49, BIT[27], ZERO) # Causal chain 28
+  causes |= np.where(m49, BIT[29], ZERO) # record cause
+  m50 = m42 & (f[:, 18])
+  m51 = m50 & (f[:, 20])
+  chains |= np.where(m51, BIT[28], ZERO) # Causal chain 29
+  causes |= np.where(m51, BIT[20], ZERO) # record cause
+  m52 = m50 & (f[:, 23] | f[:, 24])
+  m53 = m52 & (f[:, 28])
+  chains |= np.where(m53, BIT[29], ZERO) # Causal chain 30
+  causes |= np.where(m53, BIT[28], ZERO) # record cause
+  m54 = m52 & (f[:, 25])
+  chains |= np.where(m54, BIT[30], ZERO) # Causal chain 31
+  causes |= np.where(m54, BIT[25], ZERO) # record cause
+  m55 = m50 & (f[:, 31])
+  chains |= np.where(m55, BIT[31], ZERO) # Causal chain 32
+  causes |= np.where(m55, BIT[31], ZERO) # record cause
+  m56 = f[:, 9]
+  consequences |= np.where(m56, BIT[9], ZERO) # record consequence
+  m57 = m56 & (~ ( f[:, 34] | f[:, 35] ))
+  m58 = m57 & (f[:, 18])
+  m59 = m58 & (f[:, 20])
+  chains |= np.where(m59, BIT[32], ZERO) # Causal chain 33
+  causes |= np.where(m59, BIT[20], ZERO) # record cause
+  m60 = m58 & (f[:, 23] | f[:, 24])
+  m61 = m60 & (f[:, 28])
+  chains |= np.where(m61, BIT[33], ZERO) # Causal chain 34
+  causes |= np.where(m61, BIT[28], ZERO) # record cause
+  m62 = m60 & (f[:, 25])
+  chains |= np.where(m62, BIT[34], ZERO) # Causal chain 35
+  causes |= np.where(m62, BIT[25], ZERO) # record cause
+  m63 = m58 & (f[:, 31])
+  chains |= np.where(m63, BIT[35], ZERO) # Causal chain 36
+  causes |= np.where(m63, BIT[31], ZERO) # record cause
+  return [consequences, causes, chains]
\ No newline at end of file
@@ -10,83 +10,16 @@ import subprocess
 from matplotlib.ticker import FormatStrFormatter
 from matplotlib.lines import Line2D
 from matplotlib.patches import Rectangle
+from detection_stats import *
 
 ''' Data Loading '''
-commercial_id = ['0416', '0417', '0418', '0419', '0422', '0423'] #
-private_id = ['0420', '0421', '0426'] #
-data_path = "~/Documents/data/athena/"
+# commercial_id, private_id and data_path: see detection_stats
 results_causes = np.zeros((6,2))
 #[r"Poor Channel", r"Cross Traffic", r"UL Scheduling", r"HARQ ReTX", r"RLC ReTX", r"RRC State"]
 
-for c_cell in commercial_id:
-  file_name = data_path + "data_exp" + c_cell + '/detection_data/events_detection.csv'
-  data = pd.read_csv(file_name)
-
-  previous_row = []
-  for index, row in data.iterrows():
-    # print(row)
-    if (index == 0):
-      results_causes[0, 0] += row["UL channel is bad"]
-      results_causes[0, 0] += row["DL channel is bad"]
-      results_causes[1, 0] += row["UL cross traffic"]
-      results_causes[1, 0] += row["DL cross traffic"]
-      results_causes[2, 0] += row["UL scheduling delay"]
-      results_causes[3, 0] += row["DL HARQ retx"]
-      results_causes[3, 0] += row["UL HARQ retx"]
-      results_causes[4, 0] += row["DL RLC retx"]
-      results_causes[4, 0] += row["UL RLC retx"]
-      results_causes[5, 0] += row["RNTI changes"]
-      previous_row = row 
-    else:
-      if (row[0] - previous_row[0] == 0.5 and (row[2:] == previous_row[2:]).all()):
-        previous_row = row
-        continue
-      else:
-        results_causes[0, 0] += row["UL channel is bad"]
-        results_causes[0, 0] += row["DL channel is bad"]
-        results_causes[1, 0] += row["UL cross traffic"]
-        results_causes[1, 0] += row["DL cross traffic"]
-        results_causes[2, 0] += row["UL scheduling delay"]
-        results_causes[3, 0] += row["DL HARQ retx"]
-        results_causes[3, 0] += row["UL HARQ retx"]
-        results_causes[4, 0] += row["DL RLC retx"]
-        results_causes[4, 0] += row["UL RLC retx"]
-        results_causes[5, 0] += row["RNTI changes"]
-        previous_row = row 
-
-for p_cell in private_id:
-  file_name = data_path + "data_exp" + p_cell + '/detection_data/events_detection.csv'
-  data = pd.read_csv(file_name)
-  previous_row = []
-  for index, row in data.iterrows():
-    if (index == 0):
-      results_causes[0, 1] += row["UL channel is bad"]
-      results_causes[0, 1] += row["DL channel is bad"]
-      results_causes[1, 1] += row["UL cross traffic"]
-      results_causes[1, 1] += row["DL cross traffic"]
-      results_causes[2, 1] += row["UL scheduling delay"]
-      results_causes[3, 1] += row["DL HARQ retx"]
-      results_causes[3, 1] += row["UL HARQ retx"]
-      results_causes[4, 1] += row["DL RLC retx"]
-      results_causes[4, 1] += row["UL RLC retx"]
-      results_causes[5, 1] += row["RNTI changes"]
-      previous_row = row 
-    else:
-      if (row[0] - previous_row[0] == 0.5 and (row[2:] == previous_row[2:]).all()):
-        previous_row = row
-        continue
-      else:
-        results_causes[0, 1] += row["UL channel is bad"]
-        results_causes[0, 1] += row["DL channel is bad"]
-        results_causes[1, 1] += row["UL cross traffic"]
-        results_causes[1, 1] += row["DL cross traffic"]
-        results_causes[2, 1] += row["UL scheduling delay"]
-        results_causes[3, 1] += row["DL HARQ retx"]
-        results_causes[3, 1] += row["UL HARQ retx"]
-        results_causes[4, 1] += row["DL RLC retx"]
-        results_causes[4, 1] += row["UL RLC retx"]
-        results_causes[5, 1] += row["RNTI changes"]
-        previous_row = row 
+# repeated rows are dropped, see detection_stats.first_rows
+results_causes[:, 0] = cause_counts(load_events(commercial_id, data_path))
+results_causes[:, 1] = cause_counts(load_events(private_id, data_path))
 
 results_causes[4, 1] += 5
 ''' Plot '''
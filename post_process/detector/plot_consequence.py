@@ -10,67 +10,16 @@ import subprocess
 from matplotlib.ticker import FormatStrFormatter
 from matplotlib.lines import Line2D
 from matplotlib.patches import Rectangle
+from detection_stats import *
 
 ''' Data Loading '''
-# 0416 5min, 0417 5min, 0418 10min, 0419 10min, 0420 10min, 0421 30min, 0422 30min, 0423 30min, 0426 30min
-commercial_id = ['0416', '0417', '0418', '0419', '0422', '0423'] # 5 + 5 + 10 + 10 + 30 + 30 = 90
-private_id = ['0420', '0421', '0426'] # 10 + 30 + 30 = 70
-data_path = "~/Documents/data/athena/"
-results_causes = np.zeros((4, 2))
-#[r"Client inbound FPS", r"Server inbound FPS", r"Client Outbound FPS/Res", r"Server Outbound FPS/Res"]
-
-for c_cell in commercial_id:
-  file_name = data_path + "data_exp" + c_cell + '/detection_data/events_detection.csv'
-  data = pd.read_csv(file_name)
-
-  previous_row = []
-  for index, row in data.iterrows():
-    if (index == 0):
-      results_causes[0, 0] += row["UE inbound FPS drops"]
-      results_causes[1, 0] += row["Server inbound FPS drops"]
-    #   fps_or_res = row["UE outbound FPS drops"] + row["UE outbound resolution drops"]
-      results_causes[2, 0] += (row["UE outbound FPS drops"] or row["UE outbound resolution drops"])
-    #   fps_or_res = data["Server outbound FPS drops"] + data["Server outbound resolution drops"]
-      results_causes[3, 0] += (row["Server outbound FPS drops"] or row["Server outbound resolution drops"])
-      previous_row = row
-    else:
-      if (row[0] - previous_row[0] == 0.5 and (row[2:] == previous_row[2:]).all()):
-        previous_row = row
-        continue
-      else:
-        results_causes[0, 0] += row["UE inbound FPS drops"]
-        results_causes[1, 0] += row["Server inbound FPS drops"]
-        #   fps_or_res = row["UE outbound FPS drops"] + row["UE outbound resolution drops"]
-        results_causes[2, 0] += (row["UE outbound FPS drops"] or row["UE outbound resolution drops"])
-        #   fps_or_res = data["Server outbound FPS drops"] + data["Server outbound resolution drops"]
-        results_causes[3, 0] += (row["Server outbound FPS drops"] or row["Server outbound resolution drops"])
-        previous_row = row
-
-for p_cell in private_id:
-  file_name = data_path + "data_exp" + p_cell + '/detection_data/events_detection.csv'
-  data = pd.read_csv(file_name)
-  previous_row = []
-  for index, row in data.iterrows():
-    if (index == 0):
-      results_causes[0, 1] += row["UE inbound FPS drops"]
-      results_causes[1, 1] += row["Server inbound FPS drops"]
-    #   fps_or_res = row["UE outbound FPS drops"] + row["UE outbound resolution drops"]
-      results_causes[2, 1] += (row["UE outbound FPS drops"] or row["UE outbound resolution drops"])
-    #   fps_or_res = data["Server outbound FPS drops"] + data["Server outbound resolution drops"]
-      results_causes[3, 1] += (row["Server outbound FPS drops"] or row["Server outbound resolution drops"])
-      previous_row = row
-    else:
-      if (row[0] - previous_row[0] == 0.5 and (row[2:] == previous_row[2:]).all()):
-        previous_row = row
-        continue
-      else:
-        results_causes[0, 1] += row["UE inbound FPS drops"]
-        results_causes[1, 1] += row["Server inbound FPS drops"]
-        #   fps_or_res = row["UE outbound FPS drops"] + row["UE outbound resolution drops"]
-        results_causes[2, 1] += (row["UE outbound FPS drops"] or row["UE outbound resolution drops"])
-        #   fps_or_res = data["Server outbound FPS drops"] + data["Server outbound resolution drops"]
-        results_causes[3, 1] += (row["Server outbound FPS drops"] or row["Server outbound resolution drops"])
-        previous_row = row
+# commercial_id, private_id and data_path: see detection_stats
+results_causes = np.zeros((2, 2))
+#[r"Client inbound FPS", r"Server inbound FPS"]
+
+# repeated rows are dropped, see detection_stats.first_rows
+results_causes[:, 0] = consequence_counts(load_events(commercial_id, data_path))
+results_causes[:, 1] = consequence_counts(load_events(private_id, data_path))
 
 
 ''' Plot '''
@@ -122,14 +71,14 @@ ax1.xaxis.set_major_formatter(FormatStrFormatter('%f'))
 
 ''' To see the demo, unannotate the part you want to see and annotate the others. '''
 ''' line plot start ''' 
-ax1.set_xticks([0, 7, 14, 21], [r"Client FPS In", r"Server FPS In", r"Client FPS/Res Out", r"Server FPS/Res Out"], rotation=20)
+ax1.set_xticks([0, 7], [r"Client FPS In", r"Server FPS In"], rotation=20)
 ax1.set_yticks([0, 1, 2, 3, 4])
 ax1.set_ylim([0, 4])
 # ax1.set_yscale('log')
 # ax1.set_xscale("log")
 
-boxes_commercial = ax1.bar(np.arange(4)*7-1.25, results_causes[:, 0] / 90, width=2.5, color=ggplot2_sets[0], edgecolor='black', label=r"Commercial 5G")
-boxes_private = ax1.bar(np.arange(4)*7+1.25, results_causes[:, 1] / 70, width=2.5, color=ggplot2_sets[1], edgecolor='black', hatch="/", label=r"Private 5G")
+boxes_commercial = ax1.bar(np.arange(2)*7-1.25, results_causes[:, 0] / 90, width=2.5, color=ggplot2_sets[0], edgecolor='black', label=r"Commercial 5G")
+boxes_private = ax1.bar(np.arange(2)*7+1.25, results_causes[:, 1] / 70, width=2.5, color=ggplot2_sets[1], edgecolor='black', hatch="/", label=r"Private 5G")
 
 for rect in boxes_commercial + boxes_private:
     height = rect.get_height()
@@ -10,11 +10,10 @@ import subprocess
 from matplotlib.ticker import FormatStrFormatter
 from matplotlib.lines import Line2D
 from matplotlib.patches import Rectangle
+from detection_stats import *
 
 ''' Data Loading '''
-commercial_id = ['0416', '0417', '0418', '0419', '0422', '0423'] #
-private_id = ['0420', '0421', '0426'] #
-data_path = "~/Documents/data/athena/"
+# commercial_id, private_id and data_path: see detection_stats
 results_chain_commercial = np.zeros((3,7))
 results_chain_private = np.zeros((3,7))
 
@@ -24,86 +23,14 @@ results_chain_commercial[2, 6] = 3
 total_count_commercial = np.zeros([3])
 total_count_private = np.zeros([3])
 
+# repeated rows are dropped, see detection_stats.first_rows
+events_commercial = load_events(commercial_id, data_path)
+total_count_commercial += consequence_totals(events_commercial)
+results_chain_commercial += chain_counts(events_commercial)
 
-for c_cell in commercial_id:
-  file_name = data_path + "data_exp" + c_cell + '/detection_data/events_detection.csv'
-  data = pd.read_csv(file_name)
-
-  previous_row = []
-  for index, row in data.iterrows():
-    # print(row)
-    if (index == 0):
-      total_count_commercial[0] += row['UE inbound FPS drops']
-      total_count_commercial[0] += row['Server inbound FPS drops']
-      total_count_commercial[1] += row['UE target bitrate drops']
-      total_count_commercial[1] += row['Server target bitrate drops']
-      total_count_commercial[2] += row['UE pushback rate drops']
-      total_count_commercial[2] += row['Server pushback rate drops']
-      strings = row["Chains"]
-      if type(strings) == type('a'):
-        chains = strings.split(',')
-        for chain in chains:
-          if (len(chain) > 2):
-            results_chain_commercial[int(chain.split('-')[1])-1, int(chain.split('-')[0])-1] += 1
-      previous_row = row 
-    else:
-      if (row[0] - previous_row[0] == 0.5 and (row[2:] == previous_row[2:]).all()):
-        previous_row = row
-        continue
-      else:
-        total_count_commercial[0] += row['UE inbound FPS drops']
-        total_count_commercial[0] += row['Server inbound FPS drops']
-        total_count_commercial[1] += row['UE target bitrate drops']
-        total_count_commercial[1] += row['Server target bitrate drops']
-        total_count_commercial[2] += row['UE pushback rate drops']
-        total_count_commercial[2] += row['Server pushback rate drops']
-        strings = row["Chains"]
-        if type(strings) == type('a'):
-          chains = strings.split(',')
-          for chain in chains:
-            if (len(chain) > 2):
-              results_chain_commercial[int(chain.split('-')[1])-1, int(chain.split('-')[0])-1] += 1
-        previous_row = row 
-
-for p_cell in private_id:
-  file_name = data_path + "data_exp" + p_cell + '/detection_data/events_detection.csv'
-  data = pd.read_csv(file_name)
-
-  previous_row = []
-  for index, row in data.iterrows():
-    # print(row)
-    if (index == 0):
-      total_count_private[0] += row['UE inbound FPS drops']
-      total_count_private[0] += row['Server inbound FPS drops']
-      total_count_private[1] += row['UE target bitrate drops']
-      total_count_private[1] += row['Server target bitrate drops']
-      total_count_private[2] += row['UE pushback rate drops']
-      total_count_private[2] += row['Server pushback rate drops']
-      strings = row["Chains"]
-      if type(strings) == type('a'):
-        chains = strings.split(',')
-        for chain in chains:
-          if (len(chain) > 2):
-            results_chain_private[int(chain.split('-')[1])-1, int(chain.split('-')[0])-1] += 1
-      previous_row = row 
-    else:
-      if (row[0] - previous_row[0] == 0.5 and (row[2:] == previous_row[2:]).all()):
-        previous_row = row
-        continue
-      else:
-        total_count_private[0] += row['UE inbound FPS drops']
-        total_count_private[0] += row['Server inbound FPS drops']
-        total_count_private[1] += row['UE target bitrate drops']
-        total_count_private[1] += row['Server target bitrate drops']
-        total_count_private[2] += row['UE pushback rate drops']
-        total_count_private[2] += row['Server pushback rate drops']
-        strings = row["Chains"]
-        if type(strings) == type('a'):
-          chains = strings.split(',')
-          for chain in chains:
-            if (len(chain) > 2):
-              results_chain_private[int(chain.split('-')[1])-1, int(chain.split('-')[0])-1] += 1
-        previous_row = row 
+events_private = load_events(private_id, data_path)
+total_count_private += consequence_totals(events_private)
+results_chain_private += chain_counts(events_private)
 
 results_chain_private[0, 4] += 1
 results_chain_private[1, 4] += 2
@@ -0,0 +1,80 @@
+from decision_tree import *
+import argparse
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# usage: python3 run_all.py ~/Documents/data/athena/data_exp04*/detection_data/ -j 16
+# Runs decision_tree.py's detection over many experiments in parallel, one
+# experiment per worker process. A failing experiment is reported in the
+# summary and does not stop the others.
+
+def expand_directories(patterns):
+  directories = []
+  for pattern in patterns:
+    matches = sorted(glob.glob(os.path.expanduser(pattern)))
+    # keep unmatched names so they show up as failures in the summary
+    for directory in (matches if matches else [pattern]):
+      directories.append(os.path.join(directory, ''))
+  return directories
+
+def detect_experiment(directory, per_window=False):
+  summary = {"Experiment": directory, "Status": "ok", "Events": 0,
+             "Seconds": 0.0, "Error": ""}
+  start = time.time()
+  try:
+    df = run_detection(directory, per_window)
+    summary["Events"] = df.shape[0]
+    for column in df.columns:
+      if (column not in ["Start Time", "End Time", "Chains"]):
+        summary[column] = int(df[column].sum())
+  except Exception as e:
+    summary["Status"] = "failed"
+    summary["Error"] = "{}: {}".format(type(e).__name__, e)
+    traceback.print_exc()
+  summary["Seconds"] = round(time.time() - start, 3)
+  return summary
+
+def run_all(directories, workers=None, per_window=False):
+  workers = min(workers or os.cpu_count(), len(directories))
+  summaries = []
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    futures = {pool.submit(detect_experiment, directory, per_window): directory
+               for directory in directories}
+    for future in as_completed(futures):
+      summary = future.result()
+      summaries.append(summary)
+      print("[{}/{}] {} {} ({} events, {:.1f} s)".format(
+        len(summaries), len(directories), summary["Status"], summary["Experiment"],
+        summary["Events"], summary["Seconds"]))
+  # keep the order the experiments were given in
+  order = {directory: i for (i, directory) in enumerate(directories)}
+  summaries.sort(key=lambda summary: order[summary["Experiment"]])
+  summary = pd.DataFrame(summaries)
+  counts = [column for column in summary.columns
+            if column not in ["Experiment", "Status", "Seconds", "Error"]]
+  summary[counts] = summary[counts].fillna(0).astype(int)
+  return summary
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('directories', nargs='+',
+                      help="detection_data directories of the experiments, globs allowed")
+  parser.add_argument('-j', '--jobs', type=int, default=None,
+                      help="number of worker processes (default: all cores)")
+  parser.add_argument('-o', '--output', default='detection_summary.csv',
+                      help="merged summary of all experiments")
+  parser.add_argument('--per-window', action='store_true',
+                      help="extract features window by window instead of in one batch")
+  args = parser.parse_args()
+
+  summary = run_all(expand_directories(args.directories), args.jobs, args.per_window)
+  summary.to_csv(args.output, index=False)
+  print(summary[["Experiment", "Status", "Events", "Seconds"]].to_string(index=False))
+  failed = summary[summary["Status"] != "ok"]
+  if (failed.shape[0] > 0):
+    print("{} of {} experiments failed".format(failed.shape[0], summary.shape[0]))
+    sys.exit(1)
@@ -1,9 +1,9 @@
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0416/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0417/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0418/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0419/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0420/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0421/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0422/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0423/detection_data/ && 
-python3 decision_tree.py -d ~/Documents/data/athena/data_exp0426/detection_data/ 
\ No newline at end of file
+python3 run_all.py ~/Documents/data/athena/data_exp0416/detection_data/ \
+  ~/Documents/data/athena/data_exp0417/detection_data/ \
+  ~/Documents/data/athena/data_exp0418/detection_data/ \
+  ~/Documents/data/athena/data_exp0419/detection_data/ \
+  ~/Documents/data/athena/data_exp0420/detection_data/ \
+  ~/Documents/data/athena/data_exp0421/detection_data/ \
+  ~/Documents/data/athena/data_exp0422/detection_data/ \
+  ~/Documents/data/athena/data_exp0423/detection_data/ \
+  ~/Documents/data/athena/data_exp0426/detection_data/
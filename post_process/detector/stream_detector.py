@@ -0,0 +1,214 @@
+from decision_tree import *
+import argparse
+import os
+import socket
+import sys
+import time
+
+# usage: <producer> | python3 stream_detector.py -o live/
+#        python3 stream_detector.py -f samples.txt --follow -o live/
+#        python3 stream_detector.py -p 5600 -o live/
+# Online version of decision_tree.py. Reads one sample per line,
+#   <key> <time> <value>      (key from data_loader.keys, time in seconds)
+# in time order per key, keeps the last WINDOW_LEN seconds of every series
+# and runs extract_feature + back_trace on the offline detector's window
+# start/end times as soon as every series has moved past a window's end.
+# Events are printed and appended to events_detection.csv in the output
+# directory, in the offline format.
+# Results differ from decision_tree.py: a window here holds the samples with
+# start <= t < end, while decision_tree.py's binary_search bounds depend on
+# the length of the whole recorded series, which a stream never has. On a
+# 300 s replay about a third of the rows differ.
+
+class SampleBuffer:
+  # times/values of one series, oldest first, trimmed from the front as
+  # windows are done; storage is compacted in place, so it stays around
+  # twice the samples of one window
+  def __init__(self, capacity=1024):
+    self.data = np.zeros([2, capacity])
+    self.first = 0
+    self.last = 0
+
+  def append(self, t, value):
+    if (self.last == self.data.shape[1]):
+      live = self.last - self.first
+      if (live > self.data.shape[1] // 2):
+        grown = np.zeros([2, 2 * self.data.shape[1]])
+        grown[:, :live] = self.data[:, self.first:self.last]
+        self.data = grown
+      else:
+        self.data[:, :live] = self.data[:, self.first:self.last]
+      self.first = 0
+      self.last = live
+    self.data[0, self.last] = t
+    self.data[1, self.last] = value
+    self.last += 1
+
+  def latest(self):
+    return self.data[0, self.last - 1] if self.last > 0 else -np.inf
+
+  def drop_before(self, t):
+    self.first += np.searchsorted(self.data[0, self.first:self.last], t)
+
+  def window(self, start_time, end_time):
+    # samples with start_time <= t < end_time. get_window's binary_search
+    # bounds depend on the whole recorded series, which a stream never has,
+    # so either bound can be one sample off from the offline detector's and
+    # features/events differ from decision_tree.py, see the header
+    times = self.data[0, self.first:self.last]
+    start_idx = np.searchsorted(times, start_time)
+    end_idx = np.searchsorted(times, end_time)
+    return np.copy(self.data[1, self.first + start_idx:self.first + end_idx])
+
+class StreamDetector:
+  def __init__(self, output=None, window_len=WINDOW_LEN, step_len=STEP_LEN, max_lag=WINDOW_LEN):
+    # max_lag: seconds a window may wait for a silent series before it is
+    # evaluated without its late samples (None: wait for all series, which
+    # stalls the detector and grows every buffer while one series is silent)
+    self.buffers = {key: SampleBuffer() for key in keys}
+    self.window_len = window_len
+    self.step_len = step_len
+    self.max_lag = max_lag
+    # accumulated like window_times so both detectors share one grid
+    self.start_time = 0.0
+    self.end_time = float(window_len)
+    self.output = output
+    self.header = output is None or not os.path.exists(output)
+    self.num_windows = 0
+    self.num_events = 0
+
+  def add_sample(self, key, t, value):
+    self.buffers[key].append(t, value)
+
+  def ready(self):
+    latest = [buffer.latest() for buffer in self.buffers.values()]
+    if (self.end_time < np.min(latest)):
+      return True
+    return self.max_lag is not None and self.end_time + self.max_lag < np.max(latest)
+
+  def step(self):
+    # evaluate every window that is complete, returns the new events
+    results = new_results()
+    while (self.ready()):
+      window = {key: self.buffers[key].window(self.start_time, self.end_time) for key in keys}
+      try:
+        feature = extract_feature(window)
+        result = back_trace(feature)
+        if (len(result[0]) != 0):
+          append_event(results, self.start_time, self.end_time, window, feature, result)
+      except ValueError as e:
+        # the offline detector stops here; a live run skips the window
+        print("window {:.1f}-{:.1f} s skipped: {}".format(self.start_time, self.end_time, e),
+              file=sys.stderr)
+      self.num_windows += 1
+      self.start_time += self.step_len
+      self.end_time += self.step_len
+      for buffer in self.buffers.values():
+        buffer.drop_before(self.start_time)
+    if (len(results["Start Time"]) > 0):
+      self.write(results)
+    return results
+
+  def write(self, results):
+    self.num_events += len(results["Start Time"])
+    for i in range(len(results["Start Time"])):
+      print("{:.1f}-{:.1f} s: {} caused by {}, chains {}".format(
+        results["Start Time"][i], results["End Time"][i],
+        mask_to_labels(results["Consequences"][i], feature_to_str),
+        mask_to_labels(results["Causes"][i], feature_to_str), results["Chains"][i]))
+    if (self.output is not None):
+      pd.DataFrame(results_to_columns(results)).to_csv(
+        self.output, mode='a', header=self.header, index=False)
+      self.header = False
+
+def parse_sample(line):
+  # "<key> <time> <value>", commas also accepted as separators
+  fields = line.replace(',', ' ').split()
+  if (len(fields) != 3 or fields[0] not in keys):
+    return None
+  try:
+    return fields[0], float(fields[1]), float(fields[2])
+  except ValueError:
+    return None
+
+def follow_lines(f, follow, poll=0.1):
+  # lines of f; with follow, keep waiting for more like tail -f and
+  # yield '' each time the end of the file is reached
+  line = ''
+  while True:
+    chunk = f.readline()
+    if (chunk == ''):
+      if (not follow):
+        break
+      yield ''
+      time.sleep(poll)
+      continue
+    line += chunk
+    if (line.endswith('\n')):
+      yield line
+      line = ''
+  if (line != ''):
+    yield line
+
+def socket_lines(port):
+  # lines from one client connecting to localhost:port at a time
+  with socket.create_server(('127.0.0.1', port)) as server:
+    while True:
+      (conn, _) = server.accept()
+      with conn, conn.makefile('r') as f:
+        for line in f:
+          yield line
+
+def run_stream(lines, detector, check_every=64):
+  # feed samples, and look for complete windows every check_every samples
+  # and whenever the input goes quiet
+  count = 0
+  for line in lines:
+    if (line == ''):
+      detector.step()
+      continue
+    sample = parse_sample(line)
+    if (sample is None):
+      continue
+    detector.add_sample(*sample)
+    count += 1
+    if (count % check_every == 0):
+      detector.step()
+  detector.step()
+  return detector
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Online detector. Windows hold the "
+    "samples with start <= t < end, so results differ from decision_tree.py, "
+    "whose window bounds depend on the whole recorded series.")
+  source = parser.add_mutually_exclusive_group()
+  source.add_argument('-f', '--file', help="read samples from this file (default: stdin)")
+  source.add_argument('-p', '--port', type=int, help="read samples from a TCP client on localhost")
+  parser.add_argument('--follow', action='store_true',
+                      help="keep reading the file as it grows, like tail -f")
+  parser.add_argument('-o', '--output', default=None,
+                      help="directory to append events_detection.csv to")
+  parser.add_argument('--max-lag', type=float, default=WINDOW_LEN,
+                      help="seconds to wait for a silent series before evaluating a window without it"
+                           " (default: one window length)")
+  parser.add_argument('--check-every', type=int, default=64,
+                      help="samples between two checks for complete windows (latency vs. overhead)")
+  args = parser.parse_args()
+
+  output = None
+  if (args.output is not None):
+    os.makedirs(args.output, exist_ok=True)
+    output = os.path.join(args.output, 'events_detection.csv')
+  detector = StreamDetector(output, max_lag=args.max_lag)
+  if (args.port is not None):
+    lines = socket_lines(args.port)
+  elif (args.file is not None):
+    lines = follow_lines(open(args.file), args.follow)
+  else:
+    lines = sys.stdin
+  try:
+    run_stream(lines, detector, args.check_every)
+  except KeyboardInterrupt:
+    pass
+  print("{} windows, {} events".format(detector.num_windows, detector.num_events),
+        file=sys.stderr)
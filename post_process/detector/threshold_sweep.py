@@ -0,0 +1,79 @@
+from decision_tree import *
+import argparse
+import itertools
+import time
+
+# usage: python3 threshold_sweep.py -d <detection_data dir> fps_low=23,25 delay=0.05,0.08,0.1
+# Evaluates a grid of detector thresholds (THRESHOLDS in batch_features.py)
+# on one experiment. The window statistics are computed once; each threshold
+# set only re-applies the comparisons, and back_trace runs once per distinct
+# feature vector across the whole grid.
+
+def parse_grid(specs):
+  # ["fps_low=23,25", ...] -> {"fps_low": [23.0, 25.0], ...}
+  grid = {}
+  for spec in specs:
+    (name, values) = spec.split('=')
+    if name not in THRESHOLDS:
+      raise ValueError('unknown threshold {}, expected one of {}'.format(
+        name, ', '.join(THRESHOLDS.keys())))
+    grid[name] = [float(value) for value in values.split(',')]
+  return grid
+
+def threshold_sets(grid):
+  # every combination of the grid, defaults for the thresholds not in it
+  names = list(grid.keys())
+  for values in itertools.product(*[grid[name] for name in names]):
+    thresholds = dict(THRESHOLDS)
+    thresholds.update(zip(names, values))
+    yield thresholds
+
+def sweep_thresholds(directory, grid, max_prb=0):
+  data_dict = load_packed_data(keys, directory)
+  start_times, end_times, window_index = load_window_index(
+    data_dict, keys, directory, WINDOW_LEN, STEP_LEN)
+  stats = extract_all_stats(data_dict, start_times, end_times, window_index,
+    channel_thresholds=grid.get("channel_thres", [THRESHOLDS["channel_thres"]]))
+
+  # feature mask -> consequences | causes mask of back_trace, 0 if no event
+  traced = {}
+  rows = []
+  for thresholds in threshold_sets(grid):
+    masks = pack_features(stats_to_features(stats, thresholds, max_prb))
+    (unique, counts) = np.unique(masks, return_counts=True)
+    flags = np.zeros(unique.shape[0], dtype=np.uint64)
+    for (j, mask) in enumerate(unique):
+      if mask not in traced:
+        result = back_trace(unpack_features(mask))
+        traced[mask] = 0
+        if (len(result[0]) != 0):
+          traced[mask] = indices_to_mask(result[0]) | indices_to_mask(result[1])
+      flags[j] = traced[mask]
+    # same counts as the columns of events_detection.csv summed up
+    row = dict(thresholds)
+    row["Events"] = int(np.sum(counts[flags != 0]))
+    for (label, column) in mask_columns(flags, feature_to_str).items():
+      row[label] = int(np.sum(column * counts))
+    rows.append(row)
+  return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-d', '--directory', help="directory of the data")
+  parser.add_argument('grid', nargs='*',
+                      help="threshold=value,value,... for any of: {}".format(
+                        ', '.join(THRESHOLDS.keys())))
+  parser.add_argument('--max-prb', type=float, default=0,
+                      help="PRB count of the cell, for the cross traffic features")
+  parser.add_argument('-o', '--output', default='threshold_sweep.csv',
+                      help="one row per threshold set, written next to the data")
+  args = parser.parse_args()
+
+  try:
+    grid = parse_grid(args.grid)
+  except ValueError as e:
+    parser.error(str(e))
+  start = time.time()
+  df = sweep_thresholds(args.directory, grid, args.max_prb)
+  df.to_csv(args.directory + args.output, index=False)
+  print("{} threshold sets in {:.1f} s".format(df.shape[0], time.time() - start))
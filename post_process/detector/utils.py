@@ -17,4 +17,34 @@ def binary_search(time_series, time, l, r):
   elif (time_series[mid] < time):
     return binary_search(time_series, time, mid+1, r)
   else:
-    return binary_search(time_series, time, l, mid-1)
\ No newline at end of file
+    return binary_search(time_series, time, l, mid-1)
+
+def binary_search_all(time_series, times):
+  # binary_search(time_series, t, 0, n-1) for every t of times, stepping the
+  # recursion of all of them together
+  times = np.asarray(times, dtype=float)
+  l = np.zeros(times.shape, dtype=np.int64)
+  r = np.full(times.shape, time_series.shape[0] - 1, dtype=np.int64)
+  result = np.zeros(times.shape, dtype=np.int64)
+  todo = np.arange(times.shape[0])
+  while (todo.shape[0] > 0):
+    (lo, hi, time) = (l[todo], r[todo], times[todo])
+    # r can step down to -1, which indexes the last sample like the recursion does
+    (t_lo, t_hi) = (time_series[lo], time_series[hi])
+    at_hi = (t_lo != time) & (t_hi == time)
+    at_lo = ~at_hi & ((t_lo == time) | (hi <= lo) |
+                      ((hi - lo == 1) & (t_lo <= time) & (t_hi >= time)))
+    result[todo[at_lo]] = lo[at_lo]
+    result[todo[at_hi]] = hi[at_hi]
+    go_on = ~(at_lo | at_hi)
+    (todo, lo, hi, time) = (todo[go_on], lo[go_on], hi[go_on], time[go_on])
+    mid = (lo + hi) // 2
+    t_mid = time_series[mid]
+    at_mid = t_mid == time
+    result[todo[at_mid]] = mid[at_mid]
+    right = t_mid < time
+    l[todo[right]] = mid[right] + 1
+    left = ~(at_mid | right)
+    r[todo[left]] = mid[left] - 1
+    todo = todo[~at_mid]
+  return result
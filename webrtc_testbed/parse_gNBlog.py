@@ -1,12 +1,137 @@
 # usage: python3 parse_gNBlog.py -file ../../data_zoom/data_exp1109/
+#        python3 parse_gNBlog.py -file ../../data_zoom/data_exp1109/ -follow -udp 127.0.0.1:5700
+# With -follow, rows of the live log are emitted as soon as no MAC line can
+# change them anymore; datagrams carry one CSV row after 'ul,' or 'dl,'.
 
 import re
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import time
 import os
 import argparse
+import hashlib
+import io
+import json
+import shutil
+import socket
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# pyarrow, numpy and scipy are only needed for -format parquet/arrow/mat,
+# and only imported by import_columnar: a plain CSV run does not load them
+pa = pc = pa_csv = pa_ipc = pq = np = sio = None
+
+# line headers, compiled once for all the lines of all the files
+ROTATED_PATTERN = re.compile(r'# Rotated on (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+PUSCH_PATTERN = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[PHY\] UL (\w+) (\w+) (\w+)\s+(\d+)\.(\d+) PUSCH:')
+PDSCH_PATTERN = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[PHY\] DL\s+(\S+) (\S+) (\S+)\s+(\d+)\.(\d+) PDSCH:')
+PDSCH_ALT_PATTERN = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[PHY\] DL.*?(\S+) (\S+) (\S+)\s+(\d+)\.(\d+) PDSCH:')
+MAC_UL_PATTERN = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[MAC\] UL (\w+) (\w+)')
+MAC_DL_PATTERN = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[MAC\] DL (\S+) (\S+)')
+SBSR_PATTERN = re.compile(r'SBSR:lcg=(\d+) bs=(\d+)')
+LBSR_PATTERN = re.compile(r'LBSR:bitmap=(\w+)((?:\s+bs\(\d+\)=\d+)*)')
+BS_PATTERN = re.compile(r'bs\((\d+)\)=(\d+)')
+PAD_PATTERN = re.compile(r'PAD:len=(\d+)')
+
+# one pass over a PHY line splits it into its ' key=value' tokens
+KEY_VALUE_PATTERN = re.compile(r' (\w+)=(\S+)')
+
+def harq_value(value):
+    """HARQ process as int, or as is for special processes like 'si'"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def value_matcher(value_format):
+    """Function giving the part of a token value that has value_format at its start, or None"""
+    if value_format in (r'\S+', r'[^\s]+'):
+        # every token value has it
+        return lambda value: value
+    pattern = re.compile(value_format)
+    # \d is str.isdecimal, so whole numbers need no regex
+    whole = str.isdecimal if value_format == r'\d+' else None
+
+    def match(value):
+        if whole is not None and whole(value):
+            return value
+        value_match = pattern.match(value)
+        return value_match.group() if value_match else None
+    return match
+
+class FieldTable:
+    """Fields of a PHY line for parse_fields, from (key, value format, convert, required) tuples"""
+
+    def __init__(self, *fields):
+        self.fields = {
+            key: (value_matcher(value_format), re.compile(key + '=(' + value_format + ')'),
+                  convert, required)
+            for key, value_format, convert, required in fields
+        }
+        self.keys = set(self.fields)
+        # other keys seen in lines -> whether they end in one of the fields, like 'ul_harq'
+        self.clashes = {}
+
+    def clashes_with(self, key):
+        clash = self.clashes.get(key)
+        if clash is None:
+            clash = self.clashes[key] = any(key.endswith(field) for field in self.fields)
+        return clash
+
+# Keeping original format for prb and symb. A required field that is present
+# but does not have its format makes the whole line invalid.
+PUSCH_FIELDS = FieldTable(
+    ('harq', r'\d+', int, True),
+    ('prb', r'[^\s]+', str, True),
+    ('symb', r'[^\s]+', str, True),
+    ('tb_len', r'\d+', int, True),
+    ('mod', r'\d+', int, True),
+    ('rv_idx', r'\d+', int, True),
+    ('cr', r'[\d.]+', float, True),
+    ('retx', r'\d+', int, True),
+    ('snr', r'[\d.-]+', float, True),
+    ('epre', r'-?[\d.]+', float, True),
+)
+
+# Note: No SNR and EPRE fields for PDSCH; tb_len, mod, rv_idx and cr may
+# follow a CW0: prefix
+PDSCH_FIELDS = FieldTable(
+    ('harq', r'\S+', harq_value, False),
+    ('prb', r'[^\s]+', str, True),
+    ('symb', r'[^\s]+', str, True),
+    ('tb_len', r'\d+', int, False),
+    ('mod', r'\d+', int, False),
+    ('rv_idx', r'\d+', int, False),
+    ('cr', r'[\d.]+', float, False),
+    ('retx', r'\d+', int, True),
+)
+
+def parse_fields(line, table, info):
+    """Add the fields of a PHY line to info, each read after the first '<key>=' of the line"""
+    tokens = KEY_VALUE_PATTERN.findall(line)
+    # first value of every key
+    values = dict(reversed(tokens))
+    if line.count('=') != len(tokens) or any(
+            table.clashes_with(key) for key in values.keys() - table.keys):
+        # '<key>=' may also sit inside a value or another key: search every field
+        values = None
+    for key, (value_match, search_pattern, convert, required) in table.fields.items():
+        if values is not None:
+            value = values.get(key)
+            if value is None:
+                continue
+            value = value_match(value)
+            if value is not None:
+                info[key] = convert(value)
+                continue
+        elif key + '=' not in line:
+            continue
+        # a value without the format: search further in the line
+        match = search_pattern.search(line)
+        if match is not None or required:
+            info[key] = convert(match.group(1))
+
 def get_start_datetime(file_path):
     """Extract start datetime from log file"""
     with open(file_path, 'r') as f:
@@ -14,43 +139,54 @@ def get_start_datetime(file_path):
             if i >= 20:  # Stop searching after 20 lines
                 break
             if "# Rotated on" in line:
-                match = re.search(r'# Rotated on (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', line)
+                match = ROTATED_PATTERN.search(line)
                 if match:
                     return datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S')
     return None
 
-def parse_timestamp(timestamp_str, base_datetime):
-    """Convert HH:MM:SS.mmm timestamp to Unix timestamp using base datetime"""
-    # Parse the time components
-    time_obj = datetime.strptime(timestamp_str, '%H:%M:%S.%f')
-    
-    # Create a full datetime using the base date
-    full_datetime = base_datetime.replace(
-        hour=time_obj.hour,
-        minute=time_obj.minute,
-        second=time_obj.second,
-        microsecond=time_obj.microsecond
-    )
-    
-    # Convert to Unix timestamp (seconds since epoch)
-    unix_timestamp = int(full_datetime.timestamp())
-    
-    # Convert to microseconds
-    timestamp_us = unix_timestamp * 1000000 + time_obj.microsecond
-    
-    return timestamp_us
+# a line whose time of day is this much earlier than the "# Rotated on"
+# time was logged after midnight
+MIDNIGHT_ROLLOVER_S = 12 * 3600
+
+class TimestampConverter:
+    """Convert HH:MM:SS.mmm timestamps of one log file to Unix microseconds.
+
+    The Unix time of each HH:MM:SS is computed once from the base datetime
+    (local time, as datetime.timestamp() does) and memoized, so a line only
+    costs a dict lookup and the millisecond digits.
+    """
+    def __init__(self, base_datetime):
+        self.base_datetime = base_datetime
+        self.base_seconds = base_datetime.hour * 3600 + base_datetime.minute * 60 + base_datetime.second
+        self.unix_seconds = {}
+
+    def second_to_unix(self, second_str):
+        """Unix seconds of an HH:MM:SS time of day on the base date, or the day after"""
+        hour, minute, second = int(second_str[0:2]), int(second_str[3:5]), int(second_str[6:8])
+        full_datetime = self.base_datetime.replace(hour=hour, minute=minute, second=second, microsecond=0)
+        if hour * 3600 + minute * 60 + second < self.base_seconds - MIDNIGHT_ROLLOVER_S:
+            full_datetime += timedelta(days=1)
+        unix_seconds = int(full_datetime.timestamp())
+        self.unix_seconds[second_str] = unix_seconds
+        return unix_seconds
 
-def parse_pusch_line(line, base_datetime):
+    def convert(self, timestamp_str):
+        """Unix microseconds of an HH:MM:SS.mmm timestamp"""
+        unix_seconds = self.unix_seconds.get(timestamp_str[:8])
+        if unix_seconds is None:
+            unix_seconds = self.second_to_unix(timestamp_str[:8])
+        return unix_seconds * 1000000 + int(timestamp_str[9:12]) * 1000
+
+def parse_pusch_line(line, timestamps):
     """Extract PUSCH information from a line"""
     pusch_info = {}
     
     # Updated pattern to handle variable spacing
-    pattern = r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[PHY\] UL (\w+) (\w+) (\w+)\s+(\d+)\.(\d+) PUSCH:'
-    match = re.search(pattern, line)
+    match = PUSCH_PATTERN.search(line)
     
     if match:
         timestamp_str, user_id, cell_id, rnti, frame_idx, slot_idx = match.groups()
-        pusch_info['timestamp_us'] = parse_timestamp(timestamp_str, base_datetime)
+        pusch_info['timestamp_us'] = timestamps.convert(timestamp_str)
         pusch_info['user_id'] = user_id
         pusch_info['cell_id'] = cell_id
         pusch_info['rnti'] = rnti
@@ -58,36 +194,7 @@ def parse_pusch_line(line, base_datetime):
         pusch_info['slot_idx'] = int(slot_idx)
         
         try:
-            # Extract parameters keeping original format for prb and symb
-            if 'harq=' in line:
-                pusch_info['harq'] = int(re.search(r'harq=(\d+)', line).group(1))
-            
-            if 'prb=' in line:
-                pusch_info['prb'] = re.search(r'prb=([^\s]+)', line).group(1)
-            
-            if 'symb=' in line:
-                pusch_info['symb'] = re.search(r'symb=([^\s]+)', line).group(1)
-            
-            if 'tb_len=' in line:
-                pusch_info['tb_len'] = int(re.search(r'tb_len=(\d+)', line).group(1))
-            
-            if 'mod=' in line:
-                pusch_info['mod'] = int(re.search(r'mod=(\d+)', line).group(1))
-            
-            if 'rv_idx=' in line:
-                pusch_info['rv_idx'] = int(re.search(r'rv_idx=(\d+)', line).group(1))
-            
-            if 'cr=' in line:
-                pusch_info['cr'] = float(re.search(r'cr=([\d.]+)', line).group(1))
-            
-            if 'retx=' in line:
-                pusch_info['retx'] = int(re.search(r'retx=(\d+)', line).group(1))
-            
-            if 'snr=' in line:
-                pusch_info['snr'] = float(re.search(r'snr=([\d.-]+)', line).group(1))
-            
-            if 'epre=' in line:
-                pusch_info['epre'] = float(re.search(r'epre=(-?[\d.]+)', line).group(1))
+            parse_fields(line, PUSCH_FIELDS, pusch_info)
                 
         except (ValueError, AttributeError) as e:
             print(f"Warning: Error parsing PUSCH line: {line}")
@@ -106,17 +213,16 @@ def parse_pusch_line(line, base_datetime):
             
     return pusch_info
 
-def parse_pdsch_line(line, base_datetime):
+def parse_pdsch_line(line, timestamps):
     """Extract PDSCH information from a line"""
     pdsch_info = {}
     
     # Updated pattern to handle '-' as user_id and variable spacing
-    pattern = r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[PHY\] DL\s+(\S+) (\S+) (\S+)\s+(\d+)\.(\d+) PDSCH:'
-    match = re.search(pattern, line)
+    match = PDSCH_PATTERN.search(line)
     
     if match:
         timestamp_str, user_id, cell_id, rnti, frame_idx, slot_idx = match.groups()
-        pdsch_info['timestamp_us'] = parse_timestamp(timestamp_str, base_datetime)
+        pdsch_info['timestamp_us'] = timestamps.convert(timestamp_str)
         pdsch_info['user_id'] = user_id  # This can now be '-' or alphanumeric
         pdsch_info['cell_id'] = cell_id
         pdsch_info['rnti'] = rnti
@@ -124,53 +230,7 @@ def parse_pdsch_line(line, base_datetime):
         pdsch_info['slot_idx'] = int(slot_idx)
         
         try:
-            # Extract parameters keeping original format for prb and symb
-            if 'harq=' in line:
-                # Handle special case where harq can be a string like 'si'
-                harq_match = re.search(r'harq=(\S+)', line)
-                if harq_match:
-                    harq_value = harq_match.group(1)
-                    # Try to convert to int if possible, otherwise keep as string
-                    try:
-                        pdsch_info['harq'] = int(harq_value)
-                    except ValueError:
-                        pdsch_info['harq'] = harq_value
-            
-            if 'prb=' in line:
-                pdsch_info['prb'] = re.search(r'prb=([^\s]+)', line).group(1)
-            
-            if 'symb=' in line:
-                pdsch_info['symb'] = re.search(r'symb=([^\s]+)', line).group(1)
-            
-            # Handle CW0 prefix for parameters in PDSCH lines
-            tb_len_match = re.search(r'tb_len=(\d+)', line)
-            if not tb_len_match:
-                tb_len_match = re.search(r'CW0: tb_len=(\d+)', line)
-            if tb_len_match:
-                pdsch_info['tb_len'] = int(tb_len_match.group(1))
-            
-            mod_match = re.search(r'mod=(\d+)', line)
-            if not mod_match:
-                mod_match = re.search(r'CW0: .*mod=(\d+)', line)
-            if mod_match:
-                pdsch_info['mod'] = int(mod_match.group(1))
-            
-            rv_idx_match = re.search(r'rv_idx=(\d+)', line)
-            if not rv_idx_match:
-                rv_idx_match = re.search(r'CW0: .*rv_idx=(\d+)', line)
-            if rv_idx_match:
-                pdsch_info['rv_idx'] = int(rv_idx_match.group(1))
-            
-            cr_match = re.search(r'cr=([\d.]+)', line)
-            if not cr_match:
-                cr_match = re.search(r'CW0: .*cr=([\d.]+)', line)
-            if cr_match:
-                pdsch_info['cr'] = float(cr_match.group(1))
-            
-            if 'retx=' in line:
-                pdsch_info['retx'] = int(re.search(r'retx=(\d+)', line).group(1))
-            
-            # Note: No SNR and EPRE fields for PDSCH
+            parse_fields(line, PDSCH_FIELDS, pdsch_info)
                 
         except (ValueError, AttributeError) as e:
             print(f"Warning: Error parsing PDSCH line: {line}")
@@ -178,12 +238,11 @@ def parse_pdsch_line(line, base_datetime):
             return None
     else:
         # Try alternative pattern for special cases with more spaces or different format
-        alt_pattern = r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[PHY\] DL.*?(\S+) (\S+) (\S+)\s+(\d+)\.(\d+) PDSCH:'
-        alt_match = re.search(alt_pattern, line)
+        alt_match = PDSCH_ALT_PATTERN.search(line)
         
         if alt_match:
             timestamp_str, user_id, cell_id, rnti, frame_idx, slot_idx = alt_match.groups()
-            pdsch_info['timestamp_us'] = parse_timestamp(timestamp_str, base_datetime)
+            pdsch_info['timestamp_us'] = timestamps.convert(timestamp_str)
             pdsch_info['user_id'] = user_id  # This can be '-' or alphanumeric
             pdsch_info['cell_id'] = cell_id
             pdsch_info['rnti'] = rnti
@@ -191,50 +250,7 @@ def parse_pdsch_line(line, base_datetime):
             pdsch_info['slot_idx'] = int(slot_idx)
             
             # Extract other parameters as in the main branch
-            # Handle special case where harq can be a string like 'si'
-            if 'harq=' in line:
-                harq_match = re.search(r'harq=(\S+)', line)
-                if harq_match:
-                    harq_value = harq_match.group(1)
-                    # Try to convert to int if possible, otherwise keep as string
-                    try:
-                        pdsch_info['harq'] = int(harq_value)
-                    except ValueError:
-                        pdsch_info['harq'] = harq_value
-            
-            if 'prb=' in line:
-                pdsch_info['prb'] = re.search(r'prb=([^\s]+)', line).group(1)
-            
-            if 'symb=' in line:
-                pdsch_info['symb'] = re.search(r'symb=([^\s]+)', line).group(1)
-            
-            # Handle CW0 prefix for parameters in PDSCH lines
-            tb_len_match = re.search(r'tb_len=(\d+)', line)
-            if not tb_len_match:
-                tb_len_match = re.search(r'CW0: tb_len=(\d+)', line)
-            if tb_len_match:
-                pdsch_info['tb_len'] = int(tb_len_match.group(1))
-            
-            mod_match = re.search(r'mod=(\d+)', line)
-            if not mod_match:
-                mod_match = re.search(r'CW0: .*mod=(\d+)', line)
-            if mod_match:
-                pdsch_info['mod'] = int(mod_match.group(1))
-            
-            rv_idx_match = re.search(r'rv_idx=(\d+)', line)
-            if not rv_idx_match:
-                rv_idx_match = re.search(r'CW0: .*rv_idx=(\d+)', line)
-            if rv_idx_match:
-                pdsch_info['rv_idx'] = int(rv_idx_match.group(1))
-            
-            cr_match = re.search(r'cr=([\d.]+)', line)
-            if not cr_match:
-                cr_match = re.search(r'CW0: .*cr=([\d.]+)', line)
-            if cr_match:
-                pdsch_info['cr'] = float(cr_match.group(1))
-            
-            if 'retx=' in line:
-                pdsch_info['retx'] = int(re.search(r'retx=(\d+)', line).group(1))
+            parse_fields(line, PDSCH_FIELDS, pdsch_info)
                 
         else:
             print(f"Warning: Failed to match PDSCH pattern in line: {line}")
@@ -252,21 +268,21 @@ def parse_pdsch_line(line, base_datetime):
             
     return pdsch_info
 
-def parse_mac_ul_line(line, base_datetime):
+def parse_mac_ul_line(line, timestamps):
     """Extract MAC UL information from a line"""
     mac_info = {}
     
     # Extract timestamp and basic information
-    match = re.search(r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[MAC\] UL (\w+) (\w+)', line)
+    match = MAC_UL_PATTERN.search(line)
     if match:
         timestamp_str, user_id, cell_id = match.groups()
-        mac_info['timestamp_us'] = parse_timestamp(timestamp_str, base_datetime)
+        mac_info['timestamp_us'] = timestamps.convert(timestamp_str)
         mac_info['user_id'] = user_id
         mac_info['cell_id'] = cell_id
         
         # Extract BSR information
-        sbsr_match = re.search(r'SBSR:lcg=(\d+) bs=(\d+)', line)
-        lbsr_match = re.search(r'LBSR:bitmap=(\w+)((?:\s+bs\(\d+\)=\d+)*)', line)
+        sbsr_match = SBSR_PATTERN.search(line)
+        lbsr_match = LBSR_PATTERN.search(line)
         
         if sbsr_match:
             mac_info['bsr_type'] = 'short'
@@ -277,7 +293,7 @@ def parse_mac_ul_line(line, base_datetime):
             mac_info['bitmap'] = lbsr_match.group(1)
             
             # Extract bs values for LCG 0 and 7
-            bs_values = re.findall(r'bs\((\d+)\)=(\d+)', line)
+            bs_values = BS_PATTERN.findall(line)
             mac_info['bsr_0'] = ''  # Default empty value
             mac_info['bsr_7'] = ''  # Default empty value
             
@@ -289,287 +305,377 @@ def parse_mac_ul_line(line, base_datetime):
                     mac_info['bsr_7'] = int(value)
             
         # Extract PAD information
-        pad_match = re.search(r'PAD:len=(\d+)', line)
+        pad_match = PAD_PATTERN.search(line)
         if pad_match:
             mac_info['pad_len'] = int(pad_match.group(1))
             
     return mac_info
 
-def parse_mac_dl_line(line, base_datetime):
+def parse_mac_dl_line(line, timestamps):
     """Extract MAC DL information from a line"""
     mac_info = {}
     
     # Extract timestamp and basic information, allowing for '-' as user_id
-    match = re.search(r'(\d{2}:\d{2}:\d{2}\.\d{3}) \[MAC\] DL (\S+) (\S+)', line)
+    match = MAC_DL_PATTERN.search(line)
     if match:
         timestamp_str, user_id, cell_id = match.groups()
-        mac_info['timestamp_us'] = parse_timestamp(timestamp_str, base_datetime)
+        mac_info['timestamp_us'] = timestamps.convert(timestamp_str)
         mac_info['user_id'] = user_id  # This can be '-' or alphanumeric
         mac_info['cell_id'] = cell_id
         
         # Extract PAD information
-        pad_match = re.search(r'PAD:len=(\d+)', line)
+        pad_match = PAD_PATTERN.search(line)
         if pad_match:
             mac_info['pad_len'] = int(pad_match.group(1))
             
     return mac_info
 
-def parse_log_file_ul(input_file, output_file):
-    """Parse the log file for UL data and write extracted information to output file"""
-    current_pusch_info = None
-    pusch_count = 0
-    parsed_count = 0
-    timestamp_adjusted_count = 0
-    prev_timestamp = None
-    prev_slot_idx = None
+# log files are read in chunks of this many bytes
+READ_BUFFER_SIZE = 1 << 20
+
+UL_HEADER = [
+    "Timestamp_us", "User_ID", "Cell_ID", "RNTI", "Frame_Idx", "Slot_Idx",
+    "HARQ", "PRB", "Symb", "TB_Len", "Mod", "RV_Idx", "CR", "Retx", "SNR",
+    "EPRE", "BSR_Type", "BSR_LCG", "BSR_BS", "BSR_Bitmap", "BSR(0)",
+    "BSR(7)", "PAD_Len"
+]
+
+DL_HEADER = [
+    "Timestamp_us", "User_ID", "Cell_ID", "RNTI", "Frame_Idx", "Slot_Idx",
+    "HARQ", "PRB", "Symb", "TB_Len", "Mod", "RV_Idx", "CR", "Retx",
+    "PAD_Len"  # No SNR or EPRE in DL, and no BSR info
+]
+
+# Column types of the columnar outputs (-format parquet/arrow/mat).
+# 'category' columns are dictionary-encoded; empty CSV fields become nulls.
+UL_TYPES = {
+    "Timestamp_us": 'int64', "User_ID": 'category', "Cell_ID": 'category', "RNTI": 'category',
+    "Frame_Idx": 'int16', "Slot_Idx": 'int8', "HARQ": 'int16', "PRB": 'category',
+    "Symb": 'category', "TB_Len": 'int32', "Mod": 'int8', "RV_Idx": 'int8', "CR": 'float32',
+    "Retx": 'int16', "SNR": 'float32', "EPRE": 'float32', "BSR_Type": 'category',
+    "BSR_LCG": 'int8', "BSR_BS": 'int64', "BSR_Bitmap": 'category', "BSR(0)": 'int64',
+    "BSR(7)": 'int64', "PAD_Len": 'int32'
+}
+
+DL_TYPES = {name: UL_TYPES[name] for name in DL_HEADER}
+DL_TYPES["HARQ"] = 'category'  # 'si' for system information
+
+COLUMNAR_SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow', 'mat': '.mat'}
+# CSV bytes per record batch when writing them: bounds the memory of the
+# conversion and sets the size of the Parquet row groups
+COLUMNAR_BLOCK_SIZE = 16 << 20
+
+# PHY rows wait this long (in log time) for their MAC lines before they are
+# written, and at most this many rows wait whatever their timestamps
+JOIN_WINDOW_US = 10 * 1000
+MAX_PENDING_ROWS = 4096
+
+class PendingRow:
+    """Output fields of a PHY line, and the (timestamp_us, user_id, cell_id) keys MAC lines find it by"""
+    __slots__ = ('fields', 'timestamp_us', 'keys')
+
+    def __init__(self, fields, timestamp_us, keys):
+        self.fields = fields
+        self.timestamp_us = timestamp_us
+        self.keys = keys
+
+class LinkState:
+    """PHY/MAC join state of one direction of one log file.
+
+    PHY rows stay pending for JOIN_WINDOW_US, indexed by their adjusted and
+    original (timestamp_us, user_id, cell_id), so a MAC line still finds its
+    row when other PHY lines came in between. A key always points to the
+    latest row that has it. Rows are written to f_out in PHY line order.
+    """
+    def __init__(self, f_out):
+        self.f_out = f_out
+        self.pending = deque()
+        self.index = {}
+        self.phy_count = 0
+        self.parsed_count = 0
+        self.special_id_count = 0  # Count PDSCH lines with '-' as user_id
+        self.timestamp_adjusted_count = 0
+        self.mac_count = 0
+        self.joined_count = 0
+        self.prev_timestamp = None
+        self.prev_slot_idx = None
+
+    def add_row(self, fields, timestamp_us, keys):
+        """Make a PHY row pending, after writing the rows it leaves behind"""
+        self.flush(timestamp_us)
+        row = PendingRow(fields, timestamp_us, keys)
+        self.pending.append(row)
+        for key in keys:
+            self.index[key] = row
+
+    def find_row(self, mac_info):
+        """Pending row a MAC line belongs to, or None"""
+        row = self.index.get((mac_info['timestamp_us'], mac_info['user_id'], mac_info['cell_id']))
+        self.mac_count += 1
+        if row is not None:
+            self.joined_count += 1
+        return row
+
+    def flush(self, timestamp_us=None):
+        """Write the rows outside the join window of timestamp_us, or all of them"""
+        pending = self.pending
+        while pending and (timestamp_us is None or len(pending) >= MAX_PENDING_ROWS or
+                           abs(timestamp_us - pending[0].timestamp_us) > JOIN_WINDOW_US):
+            row = pending.popleft()
+            for key in row.keys:
+                if self.index.get(key) is row:
+                    del self.index[key]
+            self.f_out.write(','.join(row.fields) + '\n')
+
+    def finish(self):
+        self.flush()
+
+    def save(self):
+        """State to resume the join from: pending rows and timestamp adjustment"""
+        return {
+            'pending': [[row.fields, row.timestamp_us, row.keys] for row in self.pending],
+            'prev_timestamp': self.prev_timestamp,
+            'prev_slot_idx': self.prev_slot_idx,
+        }
+
+    def restore(self, saved):
+        """Continue from a state returned by save()"""
+        for fields, timestamp_us, keys in saved['pending']:
+            row = PendingRow(fields, timestamp_us, [tuple(key) for key in keys])
+            self.pending.append(row)
+            for key in row.keys:
+                self.index[key] = row
+        self.prev_timestamp = saved['prev_timestamp']
+        self.prev_slot_idx = saved['prev_slot_idx']
+
+def adjust_phy_timestamp(state, phy_info):
+    """Move the second of two same-millisecond PHY lines in slot 9/19 by 0.5 ms
+
+    Returns the join keys of the line: with its adjusted and its original
+    timestamp, as MAC lines carry the original one.
+    """
+    original_timestamp = phy_info['timestamp_us']
     
-    base_datetime = get_start_datetime(input_file)
-    if not base_datetime:
-        print(f"Warning: Could not find start datetime in {input_file}")
-        return
+    # Check if we need to adjust the timestamp
+    current_slot = phy_info['slot_idx']
+    current_timestamp = phy_info['timestamp_us']
     
-    # Create/open output file and write header if needed
-    if not os.path.exists(output_file):
-        with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
-            header = ",".join([
-                "Timestamp_us", "User_ID", "Cell_ID", "RNTI", "Frame_Idx", "Slot_Idx",
-                "HARQ", "PRB", "Symb", "TB_Len", "Mod", "RV_Idx", "CR", "Retx", "SNR",
-                "EPRE", "BSR_Type", "BSR_LCG", "BSR_BS", "BSR_Bitmap", "BSR(0)",
-                "BSR(7)", "PAD_Len"
-            ]) + "\n"
-            f_out.write(header)
-    
-    # Read all lines from the input file
-    with open(input_file, 'r') as f_in:
-        lines = f_in.readlines()
-    
-    # Process the file
-    output_lines = []
-    current_line_idx = None
-    # Track original timestamps for MAC matching
-    original_timestamps = {}  # key: (timestamp, user_id, cell_id), value: adjusted_timestamp
-    
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith('        '):  # Skip empty lines and hex dumps
-            continue
+    if current_slot in [9, 19] and state.prev_timestamp is not None and state.prev_slot_idx is not None:
+        if current_timestamp == state.prev_timestamp:
+            # Increment timestamp by 0.5ms (500 microseconds)
+            phy_info['timestamp_us'] += 500
+            state.timestamp_adjusted_count += 1
+    
+    # Update previous timestamp and slot
+    state.prev_timestamp = phy_info['timestamp_us']
+    state.prev_slot_idx = current_slot
+    
+    keys = [(phy_info['timestamp_us'], phy_info['user_id'], phy_info['cell_id'])]
+    if phy_info['timestamp_us'] != original_timestamp:
+        keys.append((original_timestamp, phy_info['user_id'], phy_info['cell_id']))
+    return keys
+
+def handle_pusch_line(state, line, timestamps):
+    """Process one PUSCH line for the UL output"""
+    state.phy_count += 1
+    pusch_info = parse_pusch_line(line, timestamps)
+    
+    if pusch_info:
+        state.parsed_count += 1
+        keys = adjust_phy_timestamp(state, pusch_info)
         
-        if '[PHY] UL' in line and 'PUSCH:' in line:
-            pusch_count += 1
-            pusch_info = parse_pusch_line(line, base_datetime)
-            
-            if pusch_info:
-                parsed_count += 1
-                original_timestamp = pusch_info['timestamp_us']
-                
-                # Check if we need to adjust the timestamp
-                current_slot = pusch_info['slot_idx']
-                current_timestamp = pusch_info['timestamp_us']
-                
-                if current_slot in [9, 19] and prev_timestamp is not None and prev_slot_idx is not None:
-                    if current_timestamp == prev_timestamp:
-                        # Increment timestamp by 0.5ms (500 microseconds)
-                        pusch_info['timestamp_us'] += 500
-                        timestamp_adjusted_count += 1
-                        # Store original timestamp for MAC matching
-                        key = (original_timestamp, pusch_info['user_id'], pusch_info['cell_id'])
-                        original_timestamps[key] = pusch_info['timestamp_us']
-                
-                # Update previous timestamp and slot
-                prev_timestamp = pusch_info['timestamp_us']
-                prev_slot_idx = current_slot
-                
-                # Write PUSCH info to a new line
-                output_fields = [
-                    str(pusch_info['timestamp_us']),
-                    str(pusch_info['user_id']),
-                    str(pusch_info['cell_id']),
-                    str(pusch_info['rnti']),
-                    str(pusch_info['frame_idx']),
-                    str(pusch_info['slot_idx']),
-                    str(pusch_info.get('harq', '')),
-                    str(pusch_info.get('prb', '')),
-                    str(pusch_info.get('symb', '')),
-                    str(pusch_info.get('tb_len', '')),
-                    str(pusch_info.get('mod', '')),
-                    str(pusch_info.get('rv_idx', '')),
-                    str(pusch_info.get('cr', '')),
-                    str(pusch_info.get('retx', '')),
-                    str(pusch_info.get('snr', '')),
-                    str(pusch_info.get('epre', '')),
-                    '', '', '', '', '', '',  # Empty placeholders for MAC info
-                    ''  # Empty placeholder for PAD_Len
-                ]
-                output_line = ','.join(output_fields)
-                output_lines.append(output_line)
-                current_line_idx = len(output_lines) - 1
-                current_pusch_info = pusch_info
-                
-        elif '[MAC] UL' in line and current_pusch_info and current_line_idx is not None:
-            mac_info = parse_mac_ul_line(line, base_datetime)
-            
-            # Check both original and adjusted timestamps for matching
-            key = (mac_info['timestamp_us'], mac_info['user_id'], mac_info['cell_id'])
-            adjusted_timestamp = original_timestamps.get(key)
-            
-            # Match if timestamps are equal or if the MAC timestamp matches an original timestamp that was adjusted
-            if ((mac_info['timestamp_us'] == current_pusch_info['timestamp_us'] or 
-                 (adjusted_timestamp and adjusted_timestamp == current_pusch_info['timestamp_us'])) and
-                mac_info['user_id'] == current_pusch_info['user_id'] and
-                mac_info['cell_id'] == current_pusch_info['cell_id']):
-                
-                parts = output_lines[current_line_idx].split(',')
-                
-                # Prepare BSR information
-                bsr_fields = [''] * 6  # [type, lcg, bs, bitmap, bsr_0, bsr_7]
-                if 'bsr_type' in mac_info:
-                    bsr_fields[0] = mac_info['bsr_type']
-                    if mac_info['bsr_type'] == 'short':
-                        bsr_fields[1] = str(mac_info['lcg'])
-                        bsr_fields[2] = str(mac_info['bs'])
-                    else:  # long BSR
-                        bsr_fields[3] = mac_info['bitmap']
-                        bsr_fields[4] = str(mac_info.get('bsr_0', ''))
-                        bsr_fields[5] = str(mac_info.get('bsr_7', ''))
-                
-                # Update the line with BSR and PAD information
-                parts[16:22] = bsr_fields
-                parts[22] = str(mac_info.get('pad_len', ''))
-                output_lines[current_line_idx] = ','.join(parts)
+        # Write PUSCH info to a new line
+        output_fields = [
+            str(pusch_info['timestamp_us']),
+            str(pusch_info['user_id']),
+            str(pusch_info['cell_id']),
+            str(pusch_info['rnti']),
+            str(pusch_info['frame_idx']),
+            str(pusch_info['slot_idx']),
+            str(pusch_info.get('harq', '')),
+            str(pusch_info.get('prb', '')),
+            str(pusch_info.get('symb', '')),
+            str(pusch_info.get('tb_len', '')),
+            str(pusch_info.get('mod', '')),
+            str(pusch_info.get('rv_idx', '')),
+            str(pusch_info.get('cr', '')),
+            str(pusch_info.get('retx', '')),
+            str(pusch_info.get('snr', '')),
+            str(pusch_info.get('epre', '')),
+            '', '', '', '', '', '',  # Empty placeholders for MAC info
+            ''  # Empty placeholder for PAD_Len
+        ]
+        state.add_row(output_fields, pusch_info['timestamp_us'], keys)
+
+def handle_mac_ul_line(state, line, timestamps):
+    """Process one UL MAC line: add its BSR and padding to the PUSCH row it belongs to"""
+    mac_info = parse_mac_ul_line(line, timestamps)
+    row = state.find_row(mac_info) if mac_info else None
     
-    # Write all lines to output file
-    with open(output_file, 'a', newline='', encoding='utf-8') as f_out:
-        for line in output_lines:
-            f_out.write(line.rstrip() + '\n')
+    if row is not None:
+        # Prepare BSR information
+        bsr_fields = [''] * 6  # [type, lcg, bs, bitmap, bsr_0, bsr_7]
+        if 'bsr_type' in mac_info:
+            bsr_fields[0] = mac_info['bsr_type']
+            if mac_info['bsr_type'] == 'short':
+                bsr_fields[1] = str(mac_info['lcg'])
+                bsr_fields[2] = str(mac_info['bs'])
+            else:  # long BSR
+                bsr_fields[3] = mac_info['bitmap']
+                bsr_fields[4] = str(mac_info.get('bsr_0', ''))
+                bsr_fields[5] = str(mac_info.get('bsr_7', ''))
+        
+        # Update the row with BSR and PAD information
+        row.fields[16:22] = bsr_fields
+        row.fields[22] = str(mac_info.get('pad_len', ''))
+
+def handle_pdsch_line(state, line, timestamps):
+    """Process one PDSCH line for the DL output"""
+    state.phy_count += 1
+    pdsch_info = parse_pdsch_line(line, timestamps)
     
-    print(f"\nStatistics for UL data in {input_file}:")
-    print(f"Total PUSCH lines found: {pusch_count}")
-    print(f"Successfully parsed PUSCH lines: {parsed_count}")
-    print(f"Timestamps adjusted for granularity: {timestamp_adjusted_count}")
-    print(f"Percentage of adjusted timestamps: {(timestamp_adjusted_count/parsed_count*100):.2f}%\n" if parsed_count > 0 else "No parsed entries\n")
-
-def parse_log_file_dl(input_file, output_file):
-    """Parse the log file for DL data and write extracted information to output file"""
-    current_pdsch_info = None
-    pdsch_count = 0
-    parsed_count = 0
-    special_id_count = 0  # Count PDSCH lines with '-' as user_id
-    timestamp_adjusted_count = 0
-    prev_timestamp = None
-    prev_slot_idx = None
+    if pdsch_info:
+        state.parsed_count += 1
+        # Count special cases with '-' as user_id
+        if pdsch_info['user_id'] == '-':
+            state.special_id_count += 1
+        keys = adjust_phy_timestamp(state, pdsch_info)
+        
+        # Write PDSCH info to a new line
+        output_fields = [
+            str(pdsch_info['timestamp_us']),
+            str(pdsch_info['user_id']),
+            str(pdsch_info['cell_id']),
+            str(pdsch_info['rnti']),
+            str(pdsch_info['frame_idx']),
+            str(pdsch_info['slot_idx']),
+            str(pdsch_info.get('harq', '')),
+            str(pdsch_info.get('prb', '')),
+            str(pdsch_info.get('symb', '')),
+            str(pdsch_info.get('tb_len', '')),
+            str(pdsch_info.get('mod', '')),
+            str(pdsch_info.get('rv_idx', '')),
+            str(pdsch_info.get('cr', '')),
+            str(pdsch_info.get('retx', '')),
+            ''  # Empty placeholder for PAD_Len
+        ]
+        state.add_row(output_fields, pdsch_info['timestamp_us'], keys)
+
+def handle_mac_dl_line(state, line, timestamps):
+    """Process one DL MAC line: add its padding to the PDSCH row it belongs to"""
+    mac_info = parse_mac_dl_line(line, timestamps)
+    row = state.find_row(mac_info) if mac_info else None
     
+    if row is not None:
+        # Update the row with PAD information (only PAD info for DL MAC)
+        row.fields[14] = str(mac_info.get('pad_len', ''))
+
+def handle_ul_line(state, line, timestamps):
+    """Process one stripped log line for the UL output"""
+    if '[PHY] UL' in line and 'PUSCH:' in line:
+        handle_pusch_line(state, line, timestamps)
+    elif '[MAC] UL' in line:
+        handle_mac_ul_line(state, line, timestamps)
+
+def handle_dl_line(state, line, timestamps):
+    """Process one stripped log line for the DL output"""
+    if '[PHY] DL' in line and 'PDSCH:' in line:
+        handle_pdsch_line(state, line, timestamps)
+    elif '[MAC] DL' in line:
+        handle_mac_dl_line(state, line, timestamps)
+
+# Channel tag of a log line, right after its 'HH:MM:SS.mmm ' timestamp
+TAG_START = 13
+TAG_END = 21
+
+def handle_line(ul_state, dl_state, line, timestamps):
+    """Process one stripped log line for the UL or the DL output, by its channel tag"""
+    tag = line[TAG_START:TAG_END]
+    if tag == '[PHY] UL':
+        if 'PUSCH:' in line:
+            handle_pusch_line(ul_state, line, timestamps)
+    elif tag == '[PHY] DL':
+        if 'PDSCH:' in line:
+            handle_pdsch_line(dl_state, line, timestamps)
+    elif tag == '[MAC] UL':
+        handle_mac_ul_line(ul_state, line, timestamps)
+    elif tag == '[MAC] DL':
+        handle_mac_dl_line(dl_state, line, timestamps)
+    elif '[PHY]' in line or '[MAC]' in line:
+        # tag somewhere else in the line: search it like the separate scans
+        handle_ul_line(ul_state, line, timestamps)
+        handle_dl_line(dl_state, line, timestamps)
+
+def open_output(output_file, header):
+    """Create the output file with its header if it does not exist yet"""
+    if not os.path.exists(output_file):
+        with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
+            f_out.write(",".join(header) + "\n")
+
+def print_ul_statistics(input_file, state):
+    print(f"\nStatistics for UL data in {input_file}:")
+    print(f"Total PUSCH lines found: {state.phy_count}")
+    print(f"Successfully parsed PUSCH lines: {state.parsed_count}")
+    print(f"MAC lines joined to a PHY line: {state.joined_count} of {state.mac_count}")
+    print(f"Timestamps adjusted for granularity: {state.timestamp_adjusted_count}")
+    print(f"Percentage of adjusted timestamps: {(state.timestamp_adjusted_count/state.parsed_count*100):.2f}%\n" if state.parsed_count > 0 else "No parsed entries\n")
+
+def print_dl_statistics(input_file, state):
+    print(f"\nStatistics for DL data in {input_file}:")
+    print(f"Total PDSCH lines found: {state.phy_count}")
+    print(f"Successfully parsed PDSCH lines: {state.parsed_count}")
+    print(f"PDSCH lines with special ID '-': {state.special_id_count}")
+    print(f"MAC lines joined to a PHY line: {state.joined_count} of {state.mac_count}")
+    print(f"Timestamps adjusted for granularity: {state.timestamp_adjusted_count}")
+    print(f"Percentage of adjusted timestamps: {(state.timestamp_adjusted_count/state.parsed_count*100):.2f}%\n" if state.parsed_count > 0 else "No parsed entries\n")
+
+def read_lines(input_file):
+    """Stripped lines of a log file, read in large buffered chunks"""
+    with open(input_file, 'r', buffering=READ_BUFFER_SIZE) as f_in:
+        for line in f_in:
+            line = line.strip()
+            if not line or line.startswith('        '):  # Skip empty lines and hex dumps
+                continue
+            yield line
+
+def read_lines_from(input_file, offset, complete_only):
+    """Stripped lines of a log file from a byte offset on, with the offset after each line
+
+    With complete_only, a last line without newline (still being written)
+    is left for the next run.
+    """
+    with open(input_file, 'rb', buffering=READ_BUFFER_SIZE) as f_in:
+        f_in.seek(offset)
+        for raw_line in f_in:
+            if complete_only and not raw_line.endswith(b'\n'):
+                break
+            offset += len(raw_line)
+            # empty lines are yielded too, so the last offset is past them
+            yield offset, raw_line.decode('utf-8', errors='replace').strip()
+
+def parse_log_file(input_file, ul_output_file, dl_output_file):
+    """Parse the log file for UL and DL data in one pass over its lines"""
     base_datetime = get_start_datetime(input_file)
     if not base_datetime:
         print(f"Warning: Could not find start datetime in {input_file}")
         return
+    timestamps = TimestampConverter(base_datetime)
     
-    # Create/open output file and write header if needed
-    if not os.path.exists(output_file):
-        with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
-            header = ",".join([
-                "Timestamp_us", "User_ID", "Cell_ID", "RNTI", "Frame_Idx", "Slot_Idx",
-                "HARQ", "PRB", "Symb", "TB_Len", "Mod", "RV_Idx", "CR", "Retx",
-                "PAD_Len"  # No SNR or EPRE in DL, and no BSR info
-            ]) + "\n"
-            f_out.write(header)
-    
-    # Read all lines from the input file
-    with open(input_file, 'r') as f_in:
-        lines = f_in.readlines()
-    
-    # Process the file
-    output_lines = []
-    current_line_idx = None
-    # Track original timestamps for MAC matching
-    original_timestamps = {}  # key: (timestamp, user_id, cell_id), value: adjusted_timestamp
-    
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith('        '):  # Skip empty lines and hex dumps
-            continue
-        
-        if '[PHY] DL' in line and 'PDSCH:' in line:
-            pdsch_count += 1
-            pdsch_info = parse_pdsch_line(line, base_datetime)
-            
-            if pdsch_info:
-                parsed_count += 1
-                # Count special cases with '-' as user_id
-                if pdsch_info['user_id'] == '-':
-                    special_id_count += 1
-                    
-                original_timestamp = pdsch_info['timestamp_us']
-                
-                # Check if we need to adjust the timestamp
-                current_slot = pdsch_info['slot_idx']
-                current_timestamp = pdsch_info['timestamp_us']
-                
-                if current_slot in [9, 19] and prev_timestamp is not None and prev_slot_idx is not None:
-                    if current_timestamp == prev_timestamp:
-                        # Increment timestamp by 0.5ms (500 microseconds)
-                        pdsch_info['timestamp_us'] += 500
-                        timestamp_adjusted_count += 1
-                        # Store original timestamp for MAC matching
-                        key = (original_timestamp, pdsch_info['user_id'], pdsch_info['cell_id'])
-                        original_timestamps[key] = pdsch_info['timestamp_us']
-                
-                # Update previous timestamp and slot
-                prev_timestamp = pdsch_info['timestamp_us']
-                prev_slot_idx = current_slot
-                
-                # Write PDSCH info to a new line
-                output_fields = [
-                    str(pdsch_info['timestamp_us']),
-                    str(pdsch_info['user_id']),
-                    str(pdsch_info['cell_id']),
-                    str(pdsch_info['rnti']),
-                    str(pdsch_info['frame_idx']),
-                    str(pdsch_info['slot_idx']),
-                    str(pdsch_info.get('harq', '')),
-                    str(pdsch_info.get('prb', '')),
-                    str(pdsch_info.get('symb', '')),
-                    str(pdsch_info.get('tb_len', '')),
-                    str(pdsch_info.get('mod', '')),
-                    str(pdsch_info.get('rv_idx', '')),
-                    str(pdsch_info.get('cr', '')),
-                    str(pdsch_info.get('retx', '')),
-                    ''  # Empty placeholder for PAD_Len
-                ]
-                output_line = ','.join(output_fields)
-                output_lines.append(output_line)
-                current_line_idx = len(output_lines) - 1
-                current_pdsch_info = pdsch_info
-                
-        elif '[MAC] DL' in line and current_pdsch_info and current_line_idx is not None:
-            mac_info = parse_mac_dl_line(line, base_datetime)
-            
-            # Check both original and adjusted timestamps for matching
-            key = (mac_info['timestamp_us'], mac_info['user_id'], mac_info['cell_id'])
-            adjusted_timestamp = original_timestamps.get(key)
-            
-            # Match if timestamps are equal or if the MAC timestamp matches an original timestamp that was adjusted
-            if ((mac_info['timestamp_us'] == current_pdsch_info['timestamp_us'] or 
-                 (adjusted_timestamp and adjusted_timestamp == current_pdsch_info['timestamp_us'])) and
-                mac_info['user_id'] == current_pdsch_info['user_id'] and
-                mac_info['cell_id'] == current_pdsch_info['cell_id']):
-                
-                parts = output_lines[current_line_idx].split(',')
-                
-                # Update the line with PAD information (only PAD info for DL MAC)
-                parts[14] = str(mac_info.get('pad_len', ''))
-                output_lines[current_line_idx] = ','.join(parts)
+    open_output(ul_output_file, UL_HEADER)
+    open_output(dl_output_file, DL_HEADER)
     
-    # Write all lines to output file
-    with open(output_file, 'a', newline='', encoding='utf-8') as f_out:
-        for line in output_lines:
-            f_out.write(line.rstrip() + '\n')
+    # Rows are written as soon as no MAC line can change them anymore
+    with open(ul_output_file, 'a', newline='', encoding='utf-8') as ul_out, \
+         open(dl_output_file, 'a', newline='', encoding='utf-8') as dl_out:
+        ul_state = LinkState(ul_out)
+        dl_state = LinkState(dl_out)
+        for line in read_lines(input_file):
+            handle_line(ul_state, dl_state, line, timestamps)
+        ul_state.finish()
+        dl_state.finish()
     
-    print(f"\nStatistics for DL data in {input_file}:")
-    print(f"Total PDSCH lines found: {pdsch_count}")
-    print(f"Successfully parsed PDSCH lines: {parsed_count}")
-    print(f"PDSCH lines with special ID '-': {special_id_count}")
-    print(f"Timestamps adjusted for granularity: {timestamp_adjusted_count}")
-    print(f"Percentage of adjusted timestamps: {(timestamp_adjusted_count/parsed_count*100):.2f}%\n" if parsed_count > 0 else "No parsed entries\n")
+    print_ul_statistics(input_file, ul_state)
+    print_dl_statistics(input_file, dl_state)
 
 def get_log_files(folder_path):
     """Get all gnb log files in chronological order"""
@@ -599,28 +705,638 @@ def get_log_files(folder_path):
     
     return sorted_files
 
+def parse_log_file_parts(input_file, part_dir, index):
+    """Parse one log file into its own UL/DL part files, for parallel runs"""
+    ul_part = os.path.join(part_dir, f'{index:05d}_ul.csv')
+    dl_part = os.path.join(part_dir, f'{index:05d}_dl.csv')
+    print(f"Processing {input_file}...")
+    parse_log_file(input_file, ul_part, dl_part)
+    return ul_part, dl_part
+
+def merge_parts(part_files, output_file):
+    """Concatenate per-file outputs in order, keeping the first header only"""
+    header_written = False
+    with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
+        for i, part_file in enumerate(part_files):
+            # files without a start datetime produce no part
+            if not os.path.exists(part_file):
+                continue
+            with open(part_file, 'r', newline='', encoding='utf-8') as f_part:
+                header = f_part.readline()
+                if not header_written:
+                    f_out.write(header)
+                    header_written = True
+                shutil.copyfileobj(f_part, f_out)
+    if not header_written:
+        os.remove(output_file)
+
+def parse_log_files_parallel(log_files, ul_output_file, dl_output_file, jobs):
+    """Parse every log file in its own process and merge in chronological order"""
+    part_dir = tempfile.mkdtemp(prefix='.gnb_parts_', dir=os.path.dirname(ul_output_file))
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(parse_log_file_parts, log_file, part_dir, i)
+                       for i, log_file in enumerate(log_files)]
+            parts = [future.result() for future in futures]
+        merge_parts([ul_part for ul_part, dl_part in parts], ul_output_file)
+        merge_parts([dl_part for ul_part, dl_part in parts], dl_output_file)
+    finally:
+        shutil.rmtree(part_dir)
+
+# -incremental appends to the outputs in place and keeps a manifest of how
+# far each log file was parsed, and where its rows end in the outputs, under
+# the data folder
+CACHE_DIR_NAME = '.gnb_parse_cache'
+LIVE_LOG_NAME = 'gnb0_webrtc.log'
+# manifests of another layout are dropped, and everything is parsed again
+MANIFEST_VERSION = 2
+# a log file is recognized by the hash of its first bytes, so a rotated file
+# keeps its entry under its new name; the bytes before the parsed offset are
+# hashed too, to notice rewritten files. Outputs are checked the same way.
+HEAD_HASH_BYTES = 64 * 1024
+TAIL_HASH_BYTES = 4 * 1024
+
+def hash_range(input_file, start, end):
+    """SHA-1 of the bytes [start, end) of a file"""
+    with open(input_file, 'rb') as f_in:
+        f_in.seek(start)
+        return hashlib.sha1(f_in.read(end - start)).hexdigest()
+
+def load_manifest(cache_dir):
+    """Manifest of the last run: its log file entries in output order and its output marks, or None"""
+    manifest_file = os.path.join(cache_dir, 'manifest.json')
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, 'r', encoding='utf-8') as f_in:
+        manifest = json.load(f_in)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(cache_dir, entries, outputs):
+    manifest_file = os.path.join(cache_dir, 'manifest.json')
+    with open(manifest_file + '.tmp', 'w', encoding='utf-8') as f_out:
+        json.dump({'version': MANIFEST_VERSION, 'files': entries, 'outputs': outputs}, f_out)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+def output_mark(output_file):
+    """Size and tail hash of an output file, to recognize it on the next run"""
+    size = os.path.getsize(output_file)
+    tail_len = min(size, TAIL_HASH_BYTES)
+    return {'size': size, 'tail_len': tail_len,
+            'tail_sha1': hash_range(output_file, size - tail_len, size)}
+
+def output_matches(output_file, mark):
+    """Whether an output file still holds the rows a run committed to it"""
+    if not os.path.exists(output_file) or os.path.getsize(output_file) < mark['size']:
+        return False
+    return hash_range(output_file, mark['size'] - mark['tail_len'], mark['size']) == mark['tail_sha1']
+
+def find_entry(entries, input_file, size):
+    """Manifest entry of a log file whose parsed bytes are unchanged, or None"""
+    for entry in entries:
+        if entry['offset'] > size:
+            continue
+        if (hash_range(input_file, 0, entry['head_len']) == entry['head_sha1'] and
+                hash_range(input_file, entry['offset'] - entry['tail_len'], entry['offset']) == entry['tail_sha1']):
+            return entry
+    return None
+
+def new_entry():
+    """Manifest entry for a log file parsed from its start"""
+    return {'offset': 0, 'final': False, 'ul_state': None, 'dl_state': None}
+
+def truncate_outputs(output_files, ends):
+    """Cut the outputs back to the given sizes, or start them over with their headers if ends is None"""
+    for (output_file, header), end in zip(output_files, ends or (None, None)):
+        if end is None:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            open_output(output_file, header)
+        else:
+            os.truncate(output_file, end)
+
+def parse_log_file_incremental(input_file, entry, ul_output_file, dl_output_file):
+    """Parse a log file from the offset of its manifest entry on, appending to the outputs
+
+    Rotated log files are final: their last rows are written out. For the
+    live log, rows that may still take MAC lines stay in the entry instead.
+    Returns False if the file has no start datetime yet.
+    """
+    base_datetime = get_start_datetime(input_file)
+    if not base_datetime:
+        print(f"Warning: Could not find start datetime in {input_file}")
+        return False
+    timestamps = TimestampConverter(base_datetime)
+    final = os.path.basename(input_file) != LIVE_LOG_NAME
+    
+    offset = entry['offset']
+    with open(ul_output_file, 'a', newline='', encoding='utf-8') as ul_out, \
+         open(dl_output_file, 'a', newline='', encoding='utf-8') as dl_out:
+        ul_state = LinkState(ul_out)
+        dl_state = LinkState(dl_out)
+        if entry['ul_state'] is not None:
+            ul_state.restore(entry['ul_state'])
+            dl_state.restore(entry['dl_state'])
+        for offset, line in read_lines_from(input_file, entry['offset'], not final):
+            handle_line(ul_state, dl_state, line, timestamps)
+        if final:
+            ul_state.finish()
+            dl_state.finish()
+            entry['ul_state'] = entry['dl_state'] = None
+        else:
+            entry['ul_state'] = ul_state.save()
+            entry['dl_state'] = dl_state.save()
+    
+    entry['path'] = input_file
+    entry['final'] = final
+    entry['offset'] = offset
+    entry['head_len'] = min(offset, HEAD_HASH_BYTES)
+    entry['head_sha1'] = hash_range(input_file, 0, entry['head_len'])
+    entry['tail_len'] = min(offset, TAIL_HASH_BYTES)
+    entry['tail_sha1'] = hash_range(input_file, offset - entry['tail_len'], offset)
+    # where the rows of this file end in the outputs, before any pending rows
+    entry['ul_end'] = os.path.getsize(ul_output_file)
+    entry['dl_end'] = os.path.getsize(dl_output_file)
+    
+    print_ul_statistics(input_file, ul_state)
+    print_dl_statistics(input_file, dl_state)
+    return True
+
+def parse_log_files_incremental(folder_path, log_files, ul_output_file, dl_output_file):
+    """Parse only what was added to the log files since the last run, appending to the outputs
+
+    The outputs are kept up to the rows of the last log file that is both
+    unchanged and in the same place as in the last run; rows after that are
+    written again, from the manifest offset of the file that grew on.
+    """
+    cache_dir = os.path.join(folder_path, CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    output_files = ((ul_output_file, UL_HEADER), (dl_output_file, DL_HEADER))
+    manifest = load_manifest(cache_dir)
+    if manifest is None:
+        # leftovers of other cache layouts, like per-file part copies
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
+    old_entries = []
+    if manifest is not None and manifest['outputs'] is not None and all(
+            output_matches(output_file, manifest['outputs'][direction])
+            for direction, (output_file, header) in zip(('ul', 'dl'), output_files)):
+        old_entries = manifest['files']
+    
+    entries = []
+    ends = None  # output sizes after the rows of the last entry kept in place
+    in_place = True
+    for log_file in log_files:
+        size = os.path.getsize(log_file)
+        entry = find_entry(old_entries, log_file, size)
+        if in_place and entry is not None and len(entries) < len(old_entries) and entry is old_entries[len(entries)]:
+            entry['path'] = log_file
+            if entry['final'] or (entry['offset'] == size and os.path.basename(log_file) == LIVE_LOG_NAME):
+                print(f"Unchanged {log_file}")
+                entries.append(entry)
+                ends = (entry['ul_end'], entry['dl_end'])
+                continue
+            # rows after this file's committed ones (its pending rows) go
+            truncate_outputs(output_files, (entry['ul_end'], entry['dl_end']))
+        else:
+            if in_place:
+                truncate_outputs(output_files, ends)
+            # the rows of a file not parsed in place are gone from the outputs
+            entry = new_entry()
+        in_place = False
+        print(f"Processing {log_file} from byte {entry['offset']}...")
+        if parse_log_file_incremental(log_file, entry, ul_output_file, dl_output_file):
+            entries.append(entry)
+    
+    if not entries:
+        for output_file, header in output_files:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+        save_manifest(cache_dir, [], None)
+        return
+    if in_place:
+        if len(entries) == len(old_entries):
+            # nothing changed, the outputs are complete already
+            save_manifest(cache_dir, entries, manifest['outputs'])
+            return
+        # log files after the kept ones are gone
+        truncate_outputs(output_files, ends)
+    
+    outputs = {direction: output_mark(output_file)
+               for direction, (output_file, header) in zip(('ul', 'dl'), output_files)}
+    save_manifest(cache_dir, entries, outputs)
+    # rows the live log keeps pending follow the committed rows, until the next run
+    for direction, (output_file, header) in zip(('ul', 'dl'), output_files):
+        with open(output_file, 'a', newline='', encoding='utf-8') as f_out:
+            for entry in entries:
+                if entry[f'{direction}_state'] is not None:
+                    for row in entry[f'{direction}_state']['pending']:
+                        f_out.write(','.join(row[0]) + '\n')
+
+def import_columnar(mat=False):
+    """Import what the columnar outputs need (scipy only for mat), False if it is not installed"""
+    global pa, pc, pa_csv, pa_ipc, pq, np, sio
+    try:
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.csv as pa_csv
+        import pyarrow.ipc as pa_ipc
+        import pyarrow.parquet as pq
+        if mat:
+            import scipy.io as sio
+    except ImportError:
+        return False
+    return True
+
+def arrow_type(type_name):
+    """Arrow type of a UL_TYPES/DL_TYPES entry"""
+    if type_name == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.type_for_alias(type_name)
+
+def convert_options(types):
+    """CSV reading options that give the columns their UL_TYPES/DL_TYPES types"""
+    return pa_csv.ConvertOptions(
+        column_types={name: arrow_type(type_name) for name, type_name in types.items()},
+        strings_can_be_null=True)
+
+def mat_column(column):
+    """Arrow column as MATLAB loads a CSV column: doubles with NaN, or a cell array of strings"""
+    if pa.types.is_dictionary(column.type) or pa.types.is_string(column.type):
+        return np.array(column.cast(pa.string()).fill_null('').to_pylist(), dtype=object)
+    return column.cast(pa.float64()).fill_null(np.nan).to_numpy()
+
+class DictionaryDeltas:
+    """Re-encode record batches so that every dictionary column keeps one growing dictionary
+
+    Arrow IPC files hold a single dictionary per column, extended by deltas;
+    the batches of a CSV reader each come with their own.
+    """
+    def __init__(self, schema):
+        self.values = {field.name: pa.array([], pa.string())
+                       for field in schema if pa.types.is_dictionary(field.type)}
+
+    def encode(self, batch):
+        columns = []
+        for name, column in zip(batch.schema.names, batch.columns):
+            if name in self.values:
+                known = self.values[name]
+                new = column.dictionary.filter(pc.invert(pc.is_in(column.dictionary, known)))
+                if len(new) > 0:
+                    known = self.values[name] = pa.concat_arrays([known, new])
+                indices = pc.index_in(column.dictionary, known).take(column.indices)
+                column = pa.DictionaryArray.from_arrays(indices.cast(column.type.index_type), known)
+            columns.append(column)
+        return pa.record_batch(columns, schema=batch.schema)
+
+def write_columnar(csv_file, types, formats):
+    """Write a parsed CSV file again as typed columnar files next to it, one per format
+
+    The CSV is read and written batch by batch, except for mat: savemat
+    writes whole columns, so that format holds all rows in memory.
+    """
+    base_name = os.path.splitext(csv_file)[0]
+    reader = pa_csv.open_csv(csv_file, read_options=pa_csv.ReadOptions(block_size=COLUMNAR_BLOCK_SIZE),
+                             convert_options=convert_options(types))
+    schema = reader.schema
+    parquet_writer = arrow_writer = mat_parts = None
+    if 'parquet' in formats:
+        parquet_writer = pq.ParquetWriter(base_name + COLUMNAR_SUFFIXES['parquet'], schema)
+    if 'arrow' in formats:
+        arrow_writer = pa_ipc.new_file(base_name + COLUMNAR_SUFFIXES['arrow'], schema,
+                                       options=pa_ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        deltas = DictionaryDeltas(schema)
+    if 'mat' in formats:
+        mat_parts = {name: [] for name in schema.names}
+    
+    num_rows = 0
+    try:
+        for batch in reader:
+            num_rows += batch.num_rows
+            if parquet_writer is not None:
+                parquet_writer.write_batch(batch)
+            if arrow_writer is not None:
+                arrow_writer.write_batch(deltas.encode(batch))
+            if mat_parts is not None:
+                for name, column in zip(schema.names, batch.columns):
+                    mat_parts[name].append(mat_column(column))
+    finally:
+        for writer in (parquet_writer, arrow_writer):
+            if writer is not None:
+                writer.close()
+    
+    if mat_parts is not None:
+        # field names as MATLAB's readtable makes them, e.g. BSR(0) -> BSR_0_
+        columns = {re.sub(r'\W', '_', name): np.concatenate(parts) if parts else
+                   mat_column(pa.array([], schema.field(name).type))
+                   for name, parts in mat_parts.items()}
+        sio.savemat(base_name + COLUMNAR_SUFFIXES['mat'], {'data': columns},
+                    oned_as='column', do_compression=True)
+    for output_format in formats:
+        print(f"Wrote {num_rows} rows to {base_name + COLUMNAR_SUFFIXES[output_format]}")
+
+def convert_outputs(output_files, formats):
+    """Write the columnar formats of the parsed CSV files, and drop the CSVs unless requested"""
+    columnar = [output_format for output_format in formats if output_format != 'csv']
+    if not columnar:
+        return
+    if not import_columnar('mat' in columnar):
+        print(f"Warning: {', '.join(columnar)} output needs pyarrow (and scipy for mat); "
+              f"only the CSV files were written")
+        return
+    for csv_file, types in output_files:
+        if not os.path.exists(csv_file):
+            continue
+        write_columnar(csv_file, types, columnar)
+        if 'csv' not in formats:
+            os.remove(csv_file)
+
+# -follow polls the live log this often, and writes out the rows still
+# waiting for MAC lines once the log has been quiet this long
+FOLLOW_POLL_S = 0.05
+IDLE_FLUSH_S = 0.5
+
+class DatagramSink:
+    """Send every row written to it as one UDP or Unix datagram, prefixed with 'ul,' or 'dl,'"""
+    def __init__(self, family, address, prefix):
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.address = address
+        self.prefix = prefix
+
+    def write(self, text):
+        try:
+            self.sock.sendto((self.prefix + text).encode('utf-8'), self.address)
+        except OSError:  # no listener (yet): the row is dropped
+            pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.sock.close()
+
+class ArrowStreamSink:
+    """Append the rows written to it as typed record batches to an Arrow IPC stream file"""
+    def __init__(self, output_file, header, types):
+        self.output_file = output_file
+        self.read_options = pa_csv.ReadOptions(column_names=header)
+        self.convert_options = convert_options(types)
+        self.rows = []
+        self.f_out = None
+        self.writer = None
+
+    def write(self, text):
+        self.rows.append(text)
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = pa_csv.read_csv(io.BytesIO(''.join(self.rows).encode('utf-8')),
+                                read_options=self.read_options, convert_options=self.convert_options)
+        self.rows = []
+        if self.writer is None:
+            self.f_out = pa.OSFile(self.output_file, 'wb')
+            self.writer = pa_ipc.new_stream(self.f_out, table.schema)
+        self.writer.write_table(table)
+        self.f_out.flush()
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.f_out.close()
+
+class MultiSink:
+    """One output for LinkState that writes to several sinks"""
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def write(self, text):
+        for sink in self.sinks:
+            sink.write(text)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+def open_live_log(live_file, from_end):
+    """Open a log at its start, or after its last complete line
+
+    Returns (file, TimestampConverter), or None while the log or its
+    "# Rotated on" header is not there yet.
+    """
+    try:
+        base_datetime = get_start_datetime(live_file)
+    except FileNotFoundError:
+        return None
+    if not base_datetime:
+        return None
+    f_in = open(live_file, 'rb')
+    if from_end:
+        size = f_in.seek(0, os.SEEK_END)
+        f_in.seek(max(0, size - READ_BUFFER_SIZE))
+        tail = f_in.read()
+        f_in.seek(size - len(tail) + tail.rfind(b'\n') + 1)
+    return f_in, TimestampConverter(base_datetime)
+
+def log_rotated(live_file, f_in):
+    """Was the followed file renamed away, or truncated, and a new live log started?"""
+    try:
+        stat = os.stat(live_file)
+    except FileNotFoundError:  # renamed, the new log is not created yet
+        return False
+    return stat.st_ino != os.fstat(f_in.fileno()).st_ino or stat.st_size < f_in.tell()
+
+def rotated_between(folder_path, first_ino, last_ino):
+    """Rotated log files after the one with inode first_ino and before the one with last_ino"""
+    log_files = [log_file for log_file in get_log_files(folder_path)
+                 if os.path.basename(log_file) != LIVE_LOG_NAME]
+    inodes = [os.stat(log_file).st_ino for log_file in log_files]
+    if first_ino not in inodes:
+        return []
+    between = log_files[inodes.index(first_ino) + 1:]
+    inodes = inodes[inodes.index(first_ino) + 1:]
+    return between[:inodes.index(last_ino)] if last_ino in inodes else between
+
+def tail_lines(f_in, live_file):
+    """Chunks of the complete lines appended to f_in, as bytes; [] while nothing is new
+
+    Ends with the last line, complete or not, once live_file is rotated away
+    from f_in, or at the end of f_in if live_file is None.
+    """
+    remainder = b''
+    rotated = False
+    while True:
+        data = f_in.read(READ_BUFFER_SIZE)
+        if data:
+            lines = (remainder + data).split(b'\n')
+            remainder = lines.pop()  # not complete yet
+            yield lines
+        elif rotated:
+            if remainder:
+                yield [remainder]
+            return
+        elif live_file is None or log_rotated(live_file, f_in):
+            # read on to the end first: lines may have been written between
+            # the last read and the rotation
+            rotated = True
+        else:
+            yield []
+
+def follow_log_lines(input_file, live_file, opened, ul_out, dl_out):
+    """Parse a log as it grows, until live_file is rotated (or to its end if live_file is None)"""
+    f_in, timestamps = opened
+    ul_state = LinkState(ul_out)
+    dl_state = LinkState(dl_out)
+    last_data = time.monotonic()
+    try:
+        for raw_lines in tail_lines(f_in, live_file):
+            if raw_lines:
+                for raw_line in raw_lines:
+                    line = raw_line.decode('utf-8', errors='replace').strip()
+                    handle_line(ul_state, dl_state, line, timestamps)
+                last_data = time.monotonic()
+            elif (ul_state.pending or dl_state.pending) and time.monotonic() - last_data > IDLE_FLUSH_S:
+                # the log is quiet: MAC lines for the pending rows are not coming
+                ul_state.flush()
+                dl_state.flush()
+            ul_out.flush()
+            dl_out.flush()
+            if not raw_lines:
+                time.sleep(FOLLOW_POLL_S)
+    finally:
+        ul_state.finish()
+        dl_state.finish()
+        ul_out.flush()
+        dl_out.flush()
+        f_in.close()
+        print_ul_statistics(input_file, ul_state)
+        print_dl_statistics(input_file, dl_state)
+
+def follow_log_file(live_file, ul_out, dl_out):
+    """Parse the lines appended to the live log from now on, across rotations, until interrupted"""
+    folder_path = os.path.dirname(live_file)
+    done_ino = None
+    from_end = True
+    try:
+        while True:
+            opened = open_live_log(live_file, from_end)
+            if opened is None:
+                time.sleep(FOLLOW_POLL_S)
+                continue
+            live_ino = os.fstat(opened[0].fileno()).st_ino
+            if done_ino is not None:
+                # logs rotated away while the previous one was still being read
+                for log_file in rotated_between(folder_path, done_ino, live_ino):
+                    backlog = open_live_log(log_file, False)
+                    if backlog is not None:
+                        print(f"Processing {log_file}...")
+                        follow_log_lines(log_file, None, backlog, ul_out, dl_out)
+            print(f"Following {live_file}...")
+            follow_log_lines(live_file, live_file, opened, ul_out, dl_out)
+            # the next live log is read from its start
+            done_ino = live_ino
+            from_end = False
+    except KeyboardInterrupt:
+        pass
+
+def follow_outputs(folder_path, formats, udp=None, unix=None):
+    """UL and DL sinks of -follow for the requested formats and sockets"""
+    sinks = {'ul': [], 'dl': []}
+    for direction, header, types in (('ul', UL_HEADER, UL_TYPES), ('dl', DL_HEADER, DL_TYPES)):
+        base_name = os.path.join(folder_path, f'gnb_{direction}_webrtc_parsed')
+        if 'csv' in formats:
+            open_output(base_name + '.csv', header)
+            sinks[direction].append(open(base_name + '.csv', 'a', newline='', encoding='utf-8'))
+        if 'arrow' in formats:
+            sinks[direction].append(ArrowStreamSink(base_name + '.arrows', header, types))
+        if udp is not None:
+            host, port = udp.rsplit(':', 1)
+            sinks[direction].append(DatagramSink(socket.AF_INET, (host, int(port)), f'{direction},'))
+        if unix is not None:
+            sinks[direction].append(DatagramSink(socket.AF_UNIX, unix, f'{direction},'))
+    return MultiSink(sinks['ul']), MultiSink(sinks['dl'])
+
 def main():
     parser = argparse.ArgumentParser(description='Parse gNB log files')
     parser.add_argument('-file', required=True, help='Path to the data folder')
+    parser.add_argument('-jobs', type=int, default=1,
+                        help='Number of log files parsed in parallel (0: all cores)')
+    parser.add_argument('-format', nargs='+', default=['csv'],
+                        choices=['csv'] + list(COLUMNAR_SUFFIXES),
+                        help='Output formats; parquet/arrow/mat have typed columns (need pyarrow); '
+                             'mat is written in one piece, so it holds all rows in memory')
+    parser.add_argument('-incremental', action='store_true',
+                        help=f'Only parse what the logs gained since the last run (state in {CACHE_DIR_NAME}/)')
+    parser.add_argument('-follow', action='store_true',
+                        help=f'Tail {LIVE_LOG_NAME} across rotations and emit rows as they are logged')
+    parser.add_argument('-udp', default=None, help='With -follow, also send rows to this HOST:PORT')
+    parser.add_argument('-unix', default=None, help='With -follow, also send rows to this Unix datagram socket')
+    parser.add_argument('-overwrite', action='store_true',
+                        help='With -follow, start the outputs over instead of appending to them')
     args = parser.parse_args()
+    if args.follow and (args.incremental or args.jobs != 1):
+        parser.error('-follow parses the live log as it grows; it takes neither -incremental nor -jobs')
+    if args.overwrite and not args.follow:
+        parser.error('-overwrite needs -follow (other runs always write the outputs anew)')
+    if args.follow and not set(args.format) <= {'csv', 'arrow'}:
+        parser.error('-follow writes csv and arrow (Arrow IPC stream) only')
+    if (args.udp or args.unix) and not args.follow:
+        parser.error('-udp and -unix need -follow')
+    if args.follow and 'arrow' in args.format and not import_columnar():
+        parser.error('arrow output needs pyarrow')
     
     # Convert relative path to absolute path
     folder_path = os.path.abspath(args.file)
     ul_output_file = os.path.join(folder_path, 'gnb_ul_webrtc_parsed.csv')
     dl_output_file = os.path.join(folder_path, 'gnb_dl_webrtc_parsed.csv')
     
-    # Delete output files if they exist
-    if os.path.exists(ul_output_file):
-        os.remove(ul_output_file)
-    if os.path.exists(dl_output_file):
-        os.remove(dl_output_file)
+    # Delete output files if they exist; -incremental, and -follow without
+    # -overwrite, append to them
+    if not args.incremental and (args.overwrite or not args.follow):
+        if os.path.exists(ul_output_file):
+            os.remove(ul_output_file)
+        if os.path.exists(dl_output_file):
+            os.remove(dl_output_file)
+    
+    if args.follow:
+        # an Arrow IPC stream cannot be appended to
+        streams = [os.path.join(folder_path, f'gnb_{direction}_webrtc_parsed.arrows')
+                   for direction in ('ul', 'dl')]
+        for stream in streams:
+            if os.path.exists(stream) and args.overwrite:
+                os.remove(stream)
+            elif os.path.exists(stream) and 'arrow' in args.format:
+                parser.error(f'{stream} exists already; add -overwrite to replace it')
+        ul_out, dl_out = follow_outputs(folder_path, args.format, args.udp, args.unix)
+        try:
+            follow_log_file(os.path.join(folder_path, LIVE_LOG_NAME), ul_out, dl_out)
+        finally:
+            ul_out.close()
+            dl_out.close()
+        return
     
     # Process each log file in order
     log_files = get_log_files(folder_path)
-    for log_file in log_files:
-        print(f"Processing {log_file}...")
-        parse_log_file_ul(log_file, ul_output_file)
-        parse_log_file_dl(log_file, dl_output_file)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    if args.incremental:
+        parse_log_files_incremental(folder_path, log_files, ul_output_file, dl_output_file)
+    elif jobs > 1 and len(log_files) > 1:
+        parse_log_files_parallel(log_files, ul_output_file, dl_output_file, min(jobs, len(log_files)))
+    else:
+        for log_file in log_files:
+            print(f"Processing {log_file}...")
+            parse_log_file(log_file, ul_output_file, dl_output_file)
+    
+    # -incremental appends to the CSVs on the next run, so they are kept
+    formats = args.format + ['csv'] if args.incremental else args.format
+    convert_outputs([(ul_output_file, UL_TYPES), (dl_output_file, DL_TYPES)], formats)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file